@@ -0,0 +1,67 @@
+import json
+import os
+
+from manifest import hash_bytes, hash_file
+from minify import minify_css
+from output import write_output
+
+ASSET_MANIFEST_NAME = "asset-manifest.json"
+# Hex digits of the content hash kept in fingerprinted file names.
+FINGERPRINT_LENGTH = 12
+
+
+def fingerprint_name(relative, digest):
+    root, extension = os.path.splitext(relative)
+    return f"{root}.{digest[:FINGERPRINT_LENGTH]}{extension}"
+
+
+def asset_digest(path, minified):
+    # The digest is of the bytes that are written to the target, so a
+    # minified stylesheet never shares its name with the plain copy.
+    if minified:
+        with open(path, "r") as f:
+            return hash_bytes(minify_css(f.read()).encode())
+    return hash_file(path)
+
+
+def fingerprint_files(source_directory, files, previous=None, minify=False):
+    # files is a scan_static listing, {relative: [size, mtime_ns]}. Returns
+    # {relative: [size, mtime_ns, fingerprinted relative]}, with True
+    # appended for minified stylesheets; only files whose size, mtime or
+    # minification changed since the previous build are hashed again.
+    abs_path_source = os.path.abspath(source_directory)
+    previous = previous or {}
+    fingerprints = {}
+    hashed = 0
+    for relative, (size, mtime_ns) in files.items():
+        minified = minify and relative.endswith(".css")
+        entry = previous.get(relative)
+        if (entry is None or entry[:2] != [size, mtime_ns] or
+                entry[3:] != ([True] if minified else [])):
+            digest = asset_digest(os.path.join(abs_path_source, relative),
+                                  minified)
+            entry = [size, mtime_ns, fingerprint_name(relative, digest)]
+            if minified:
+                entry.append(True)
+            hashed += 1
+        fingerprints[relative] = entry
+    print(f"Fingerprinted {abs_path_source}: {len(fingerprints)} files, "
+          f"{hashed} hashed")
+    return fingerprints
+
+
+def asset_names(fingerprints):
+    return {relative: entry[2]
+            for relative, entry in (fingerprints or {}).items()}
+
+
+def asset_urls(fingerprints):
+    return {"/" + relative.replace(os.sep, "/"):
+            "/" + name.replace(os.sep, "/")
+            for relative, name in asset_names(fingerprints).items()}
+
+
+def write_asset_manifest(dest_dir_path, urls):
+    # Lets deploy tooling mark fingerprinted files as immutable.
+    return write_output(os.path.join(dest_dir_path, ASSET_MANIFEST_NAME),
+                        json.dumps(urls, indent=2, sort_keys=True))
@@ -0,0 +1,203 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from contextlib import chdir, redirect_stdout
+from io import StringIO
+
+import main as site
+from profiler import Profiler
+
+TEMPLATE = """<!doctype html>
+<html>
+  <head>
+    <title>{{ Title }}</title>
+    <link href="/index.css" rel="stylesheet" />
+  </head>
+  <body>
+    <article>{{ Content }}</article>
+  </body>
+</html>
+"""
+WORDS = ("the quick brown fox jumps over lazy dog elvish ring mountain "
+         "river shire wizard council tower forest").split()
+IMAGES = 20
+# Stages faster than this are too noisy to flag as regressions.
+MIN_STAGE_SECONDS = 0.005
+
+
+def words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def page_path(i):
+    return f"/section-{i % 100}/page-{i}"
+
+
+def generate_markdown(rng, i, pages):
+    blocks = [f"# Page {i}: {words(rng, 4)}"]
+    for _ in range(rng.randint(3, 8)):
+        kind = rng.randrange(7)
+        if kind == 0:
+            level = rng.randint(2, 6)
+            blocks.append(f"{'#' * level} {words(rng, 5)}")
+        elif kind == 1:
+            blocks.append(
+                f"{words(rng, 8)} **{words(rng, 2)}** {words(rng, 5)} "
+                f"_{words(rng, 3)}_ and `{rng.choice(WORDS)}()` "
+                f"**{words(rng, 1)}** _{words(rng, 1)}_\n{words(rng, 12)}")
+        elif kind == 2:
+            links = [f"[{words(rng, 2)}]({page_path(rng.randrange(pages))})"
+                     for _ in range(rng.randint(5, 30))]
+            blocks.append(" and ".join(links) + f" ![{words(rng, 2)}]"
+                          f"(/images/image-{rng.randrange(IMAGES)}.png)")
+        elif kind == 3:
+            blocks.append("\n".join(
+                f"- {words(rng, 6)} [{rng.choice(WORDS)}]"
+                f"({page_path(rng.randrange(pages))})"
+                for _ in range(rng.randint(5, 40))))
+        elif kind == 4:
+            blocks.append("\n".join(f"{n + 1}. {words(rng, 5)} **{n}**"
+                                    for n in range(rng.randint(3, 20))))
+        elif kind == 5:
+            code = "\n".join(f"    {words(rng, 6)} = {n}"
+                             for n in range(rng.randint(10, 200)))
+            blocks.append(f"```\n{code}\n```")
+        else:
+            blocks.append("\n".join(f"> {words(rng, 10)}"
+                                    for _ in range(rng.randint(2, 8))))
+    return "\n\n".join(blocks) + "\n"
+
+
+def generate_corpus(root, pages, seed=0):
+    rng = random.Random(seed)
+    for i in range(pages):
+        directory = os.path.join(root, "content" + page_path(i))
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "index.md"), "w") as f:
+            f.write(generate_markdown(rng, i, pages))
+
+    images = os.path.join(root, "static", "images")
+    os.makedirs(images, exist_ok=True)
+    for i in range(IMAGES):
+        with open(os.path.join(images, f"image-{i}.png"), "wb") as f:
+            f.write(rng.randbytes(rng.randint(10_000, 200_000)))
+    with open(os.path.join(root, "static", "index.css"), "w") as f:
+        f.write("body { margin: 0 auto; max-width: 40em; }\n")
+    with open(os.path.join(root, "template.html"), "w") as f:
+        f.write(TEMPLATE)
+
+
+def run_build(root, argv):
+    with chdir(root), redirect_stdout(StringIO()):
+        start = time.perf_counter()
+        site.main(argv)
+        return time.perf_counter() - start
+
+
+def profile_build(root):
+    profiler = Profiler()
+    profiler.install()
+    try:
+        run_build(root, ["--jobs", "1"])
+    finally:
+        profiler.uninstall()
+    return {name: stage["self_seconds"]
+            for name, stage in profiler.trace()["stages"].items()}
+
+
+def benchmark(pages, seed=0, repeat=3):
+    with tempfile.TemporaryDirectory() as root:
+        start = time.perf_counter()
+        generate_corpus(root, pages, seed)
+        generated = time.perf_counter() - start
+
+        total = min(run_build(root, []) for _ in range(repeat))
+        incremental = min(run_build(root, ["--incremental"])
+                          for _ in range(repeat))
+        stages = {}
+        for _ in range(repeat):
+            for name, seconds in profile_build(root).items():
+                stages[name] = min(seconds, stages.get(name, seconds))
+    return {
+        "corpus_seconds": generated,
+        "total_seconds": total,
+        "incremental_seconds": incremental,
+        "pages_per_second": pages / total,
+        "stages": stages,
+    }
+
+
+def find_regressions(results, baseline, tolerance):
+    regressions = []
+    for pages, result in results.items():
+        previous = baseline.get(pages)
+        if previous is None:
+            continue
+        checks = [("total", result["total_seconds"],
+                   previous["total_seconds"])]
+        checks.extend(
+            (f"stage {name}", seconds, previous["stages"][name])
+            for name, seconds in result["stages"].items()
+            if name in previous["stages"] and
+            previous["stages"][name] >= MIN_STAGE_SECONDS)
+        for name, current, old in checks:
+            if current > old * (1 + tolerance):
+                regressions.append(
+                    f"{pages} pages, {name}: {old:.4f}s -> {current:.4f}s "
+                    f"(+{current / old - 1:.0%})")
+    return regressions
+
+
+def report(pages, result):
+    print(f"{pages} pages: full build {result['total_seconds']:.3f}s "
+          f"({result['pages_per_second']:.0f} pages/s), no-op incremental "
+          f"{result['incremental_seconds']:.3f}s")
+    for name, seconds in sorted(result["stages"].items(),
+                                key=lambda item: item[1], reverse=True):
+        print(f"{name:>24} {seconds:>10.4f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the site build on synthetic corpora")
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 1000],
+                        help="corpus sizes to benchmark (e.g. 100 10000 "
+                        "100000)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="report the best of N builds")
+    parser.add_argument("--baseline", metavar="PATH",
+                        help="compare against a stored baseline")
+    parser.add_argument("--save-baseline", metavar="PATH",
+                        help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown before flagging a "
+                        "regression (default: 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    results = {}
+    for pages in args.pages:
+        results[str(pages)] = benchmark(pages, args.seed, args.repeat)
+        report(pages, results[str(pages)])
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import argparse
+import timeit
+
+from inline_markdown import text_to_textnodes_chained, tokenize_inline
+
+
+def link_heavy_paragraph(links):
+    parts = []
+    for i in range(links):
+        parts.append(f"See [page {i}](/blog/page-{i}) and ")
+        if i % 5 == 0:
+            parts.append(f"![figure {i}](/images/figure-{i}.png) with ")
+        if i % 50 == 0:
+            parts.append(f"**bold {i}** and _italic {i}_ and `code {i}` ")
+    return "".join(parts)
+
+
+def benchmark(sizes, repeat):
+    print(f"{'links':>8} {'chained (ms)':>14} {'single pass (ms)':>18} "
+          f"{'speedup':>8}")
+    for size in sizes:
+        text = link_heavy_paragraph(size)
+        if tokenize_inline(text) != text_to_textnodes_chained(text):
+            raise Exception(f"Tokenizers disagree on {size} links")
+
+        number = max(1, 1000 // size)
+        chained = min(timeit.repeat(lambda: text_to_textnodes_chained(text),
+                                    number=number, repeat=repeat)) / number
+        single = min(timeit.repeat(lambda: tokenize_inline(text),
+                                   number=number, repeat=repeat)) / number
+        print(f"{size:>8} {chained * 1000:>14.3f} {single * 1000:>18.3f} "
+              f"{chained / single:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the inline tokenizer with the chained passes")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10, 100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    benchmark(args.sizes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import tracemalloc
+
+from htmlnode import LeafNode, ParentNode
+from textnode import TextNode, TextType
+
+
+class DictTextNode:
+    def __init__(self, text, text_type, url=None):
+        self.text = text
+        self.text_type = text_type
+        self.url = url
+
+
+class DictHTMLNode:
+    def __init__(self, tag=None, value=None, children=None, props=None):
+        self.tag = tag
+        self.value = value
+        self.children = children
+        self.props = props
+
+
+def bytes_per_node(factory, count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    nodes = [factory(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # The list holding the nodes is not part of the node cost.
+    return (after - before) / count - 8, nodes
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure memory per TextNode and HTMLNode")
+    parser.add_argument("--count", type=int, default=100000)
+    args = parser.parse_args()
+
+    text = "shared fragment text"
+    cases = [
+        ("TextNode", lambda i: DictTextNode(text, TextType.TEXT),
+         lambda i: TextNode(text, TextType.TEXT)),
+        ("LeafNode", lambda i: DictHTMLNode(None, text),
+         lambda i: LeafNode(None, text)),
+        ("ParentNode", lambda i: DictHTMLNode("p", None, []),
+         lambda i: ParentNode("p", [])),
+    ]
+
+    print(f"{'node':>12} {'__dict__ (B)':>14} {'__slots__ (B)':>14} "
+          f"{'saved':>7}")
+    for name, before_factory, after_factory in cases:
+        before, _ = bytes_per_node(before_factory, args.count)
+        after, _ = bytes_per_node(after_factory, args.count)
+        print(f"{name:>12} {before:>14.1f} {after:>14.1f} "
+              f"{1 - after / before:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
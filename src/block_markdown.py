@@ -11,6 +11,9 @@ class BlockType(Enum):
     ORDERED_LIST = "ordered_list"
 
 
+HEADING_PATTERN = re.compile(r"#{1,6} ")
+
+
 def markdown_to_blocks(markdown):
     split_markdown = markdown.split("\n\n")
     blocks = []
@@ -21,41 +24,62 @@ def markdown_to_blocks(markdown):
     return blocks
 
 
+def iter_blocks(lines):
+    block_lines = []
+    for line in lines:
+        line = line.rstrip("\n")
+        if line != "":
+            block_lines.append(line)
+            continue
+
+        block = "\n".join(block_lines).strip()
+        if block != "":
+            yield (block, *classify_block(block))
+        block_lines = []
+
+    block = "\n".join(block_lines).strip()
+    if block != "":
+        yield (block, *classify_block(block))
+
+
 def block_to_block_type(block):
-    pattern = r"#{1,6} "
-    if re.match(pattern, block):
-        return BlockType.HEADING
-    elif block.startswith("```") and block.endswith("```"):
-        return BlockType.CODE
-    elif block.lstrip().startswith(">"):
-        block_lines = block.split("\n")
-        for line in block_lines:
-            if line.strip() == "":
-                continue
-            if not line.lstrip().startswith(">"):
-                return BlockType.PARAGRAPH
-        return BlockType.QUOTE
-    elif block.lstrip().startswith("- "):
-        block_lines = block.split("\n")
-        for line in block_lines:
-            if line.strip() == "":
-                continue
-            if not line.lstrip().startswith("- "):
-                return BlockType.PARAGRAPH
-        return BlockType.UNORDERED_LIST
-    elif block.startswith("1. "):
-        block_lines = block.split("\n")
-        for i in range(len(block_lines)):
-            if not block_lines[i].startswith(f"{i + 1}. "):
-                return BlockType.PARAGRAPH
-        return BlockType.ORDERED_LIST
+    return classify_block(block)[0]
+
+
+def classify_block(block):
+    # Splits the block once; the lines are handed on to the block's
+    # *_to_html_node builder.
+    lines = block.split("\n")
+    if HEADING_PATTERN.match(block):
+        return BlockType.HEADING, lines
+    if block.startswith("```") and block.endswith("```"):
+        return BlockType.CODE, lines
+    if block.startswith("1. "):
+        for i, line in enumerate(lines):
+            if not line.startswith(f"{i + 1}. "):
+                return BlockType.PARAGRAPH, lines
+        return BlockType.ORDERED_LIST, lines
+
+    first = next((line.lstrip() for line in lines if line.strip()), "")
+    if first.startswith(">"):
+        block_type, marker = BlockType.QUOTE, ">"
+    elif first.startswith("- "):
+        block_type, marker = BlockType.UNORDERED_LIST, "- "
     else:
-        return BlockType.PARAGRAPH
+        return BlockType.PARAGRAPH, lines
+    for line in lines:
+        stripped = line.lstrip()
+        if stripped and not stripped.startswith(marker):
+            return BlockType.PARAGRAPH, lines
+    return block_type, lines
 
 
 def extract_title(markdown):
-    markdown_lines = markdown.split("\n")
-    for line in markdown_lines:
+    return find_title(markdown.split("\n"))
+
+
+def find_title(lines):
+    for line in lines:
         if line.startswith("# "):
-            return line.split("#", 1)[1]
+            return line.rstrip("\n").split("#", 1)[1]
     raise Exception("No level 1 header present in the text")
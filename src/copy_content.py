@@ -1,26 +1,209 @@
+import fcntl
 import os
-from shutil import copy
+import queue
+import threading
+import time
+from shutil import copyfileobj, copystat
 
+from manifest import hash_file
+from minify import is_minified, minify_css_file
+from output import remove_output
+from scan import scan_tree, tree_files
 
-def copy_content(source_directory, target_directory):
+# ioctl request that asks copy-on-write filesystems (btrfs, XFS) to share
+# the source extents with the target instead of copying the data.
+FICLONE = 0x40049409
+
+# Copying is I/O bound, so threads overlap well even with the GIL.
+COPY_WORKERS = 8
+COPY_QUEUE_SIZE = 256
+
+
+def copy_content(source_directory,
+                 target_directory,
+                 workers=COPY_WORKERS):
     abs_path_source = os.path.abspath(source_directory)
     abs_path_target = os.path.abspath(target_directory)
 
     if not os.path.exists(abs_path_source):
         raise Exception("Error: Source directory does not exist")
 
-    for item in os.listdir(abs_path_source):
-        path = os.path.join(abs_path_source, item)
-        print(f"Copying {path} to {abs_path_target}")
+    files = scan_static(abs_path_source)
+    pairs = [(os.path.join(abs_path_source, relative),
+              os.path.join(abs_path_target, relative))
+             for relative in files]
+    elapsed = copy_files(pairs, workers=workers)
+    copied_bytes = sum(size for size, _ in files.values())
+    print(f"Copied {abs_path_source}: {len(pairs)} files, "
+          f"{copy_report(len(pairs), copied_bytes, elapsed)}")
+
+
+def copy_files(pairs, link=False, workers=COPY_WORKERS):
+    start = time.perf_counter()
+    for directory in sorted({os.path.dirname(target) for _, target in pairs}):
+        os.makedirs(directory, exist_ok=True)
+
+    jobs = queue.Queue(maxsize=COPY_QUEUE_SIZE)
+    errors = []
+
+    def copy_worker():
+        while True:
+            pair = jobs.get()
+            if pair is None:
+                return
+            source, target = pair
+            try:
+                clone_file(source, target, link)
+            except Exception as e:
+                errors.append(f"{source}: {e}")
+
+    threads = [threading.Thread(target=copy_worker)
+               for _ in range(max(1, min(workers, len(pairs))))]
+    for thread in threads:
+        thread.start()
+    for pair in pairs:
+        jobs.put(pair)
+    for _ in threads:
+        jobs.put(None)
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise Exception(f"Error: could not copy {errors[0]}")
+    return time.perf_counter() - start
+
+
+def copy_report(files, copied_bytes, elapsed):
+    elapsed = max(elapsed, 1e-9)
+    megabytes = copied_bytes / (1024 * 1024)
+    return (f"{megabytes:.1f} MB in {elapsed:.3f}s "
+            f"({files / elapsed:.0f} files/s, {megabytes / elapsed:.1f} MB/s)")
+
+
+def scan_static(source_directory, tree=None):
+    if tree is None:
+        tree = scan_tree(source_directory)
+    return {relative: [size, mtime_ns]
+            for relative, (size, mtime_ns) in tree_files(tree).items()}
+
+
+def clone_file(source, target, link=False):
+    if os.path.lexists(target):
+        os.remove(target)
+
+    if link:
         try:
-            if os.path.isfile(path):
-                copy(path, abs_path_target)
-                print("Copy successful!")
-            elif os.path.isdir(path):
-                new_target = os.path.join(abs_path_target, item)
-                if not os.path.exists(new_target):
-                    print(f"Creating directory: {new_target}")
-                    os.mkdir(new_target)
-                copy_content(path, new_target)
-        except Exception as e:
-            raise Exception(f"Error: an exception occurred: {e}")
+            os.link(source, target)
+            return
+        except OSError:
+            pass
+
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            size = os.fstat(src.fileno()).st_size
+            try:
+                offset = 0
+                while offset < size:
+                    copied = os.copy_file_range(src.fileno(), dst.fileno(),
+                                                size - offset)
+                    if copied == 0:
+                        break
+                    offset += copied
+            except (OSError, AttributeError):
+                dst.seek(0)
+                dst.truncate()
+                src.seek(0)
+                copyfileobj(src, dst)
+    copystat(source, target)
+
+
+def is_unchanged(source, target, size, mtime_ns, use_hash=False):
+    try:
+        stat = os.stat(target)
+    except FileNotFoundError:
+        return False
+    if stat.st_size != size:
+        return False
+    if stat.st_mtime_ns == mtime_ns:
+        return True
+    if use_hash and hash_file(source) == hash_file(target):
+        # Only the mtime differs (e.g. after a fresh checkout); record the
+        # source mtime so the next build does not hash the file again.
+        copystat(source, target)
+        return True
+    return False
+
+
+def sync_content(source_directory,
+                 target_directory,
+                 previous=None,
+                 use_hash=False,
+                 link=False,
+                 workers=COPY_WORKERS,
+                 tree=None,
+                 names=None,
+                 previous_names=None,
+                 minify=False,
+                 minified=None):
+    # names maps a file to the path it is copied to (its fingerprinted
+    # name), previous_names does the same for the previous build.
+    # minified holds the is_minified records of the previous build and is
+    # updated in place.
+    names = names or {}
+    previous_minified = dict(minified or {})
+    if minified is None:
+        minified = {}
+    minified.clear()
+    previous_names = previous_names or {}
+    abs_path_source = os.path.abspath(source_directory)
+    abs_path_target = os.path.abspath(target_directory)
+
+    if not os.path.exists(abs_path_source):
+        raise Exception("Error: Source directory does not exist")
+
+    current = scan_static(abs_path_source, tree)
+    pairs = []
+    stylesheets = []
+    copied_bytes = 0
+    for relative, (size, mtime_ns) in current.items():
+        source = os.path.join(abs_path_source, relative)
+        target = os.path.join(abs_path_target, names.get(relative, relative))
+        if minify and relative.endswith(".css"):
+            record = previous_minified.get(relative)
+            if is_minified(target, record, size, mtime_ns):
+                minified[relative] = record
+            else:
+                stylesheets.append((relative, source, target, size,
+                                    mtime_ns))
+        elif not is_unchanged(source, target, size, mtime_ns, use_hash):
+            pairs.append((source, target))
+            copied_bytes += size
+    elapsed = copy_files(pairs, link, workers)
+
+    if stylesheets:
+        source_bytes = 0
+        minified_bytes = 0
+        for relative, source, target, size, mtime_ns in stylesheets:
+            output = minify_css_file(source, target)
+            minified[relative] = [size, mtime_ns] + output
+            source_bytes += size
+            minified_bytes += output[0]
+        print(f"Minified {len(stylesheets)} stylesheets: {source_bytes} -> "
+              f"{minified_bytes} bytes")
+
+    outputs = {names.get(relative, relative) for relative in current}
+    removed = 0
+    for relative in previous or {}:
+        output = previous_names.get(relative, relative)
+        if output not in outputs:
+            remove_output(os.path.join(abs_path_target, output),
+                          abs_path_target)
+            removed += 1
+
+    print(f"Synced {abs_path_source}: {len(pairs)} copied, "
+          f"{len(current) - len(pairs) - len(stylesheets)} unchanged, "
+          f"{removed} removed, "
+          f"{copy_report(len(pairs), copied_bytes, elapsed)}")
+    return current
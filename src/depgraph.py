@@ -0,0 +1,94 @@
+import os
+
+from block_markdown import BlockType, iter_blocks
+from inline_markdown import text_to_textnodes
+from template import URL_ATTRIBUTE_PATTERN
+from textnode import TextType
+
+# Change-set entry meaning "the template (or the basepath baked into it)
+# changed"; every page depends on it.
+TEMPLATE = "{{ template }}"
+
+
+def normalize_url(url):
+    url = url.split("#", 1)[0].split("?", 1)[0]
+    if url.endswith(".html"):
+        url = url[:-len(".html")]
+    if url.endswith("/index"):
+        url = url[:-len("index")]
+    if url != "/":
+        url = url.rstrip("/")
+    return url
+
+
+def source_url(source):
+    return normalize_url("/" + os.path.splitext(source)[0].replace(os.sep, "/")
+                         + ".html")
+
+
+def page_references(lines):
+    references = []
+    for block, block_type, _ in iter_blocks(lines):
+        if block_type == BlockType.CODE:
+            continue
+        for node in text_to_textnodes(block.replace("\n", " ")):
+            if (node.text_type in (TextType.IMAGE, TextType.LINK) and
+                    node.url.startswith("/")):
+                references.append(node.url)
+    return normalize_references(references)
+
+
+def normalize_references(urls):
+    return sorted({normalize_url(url) for url in urls})
+
+
+def template_references(text):
+    return sorted({normalize_url(url)
+                   for _, url in URL_ATTRIBUTE_PATTERN.findall(text)})
+
+
+class DependencyGraph:
+    def __init__(self, references=None):
+        self.references = dict(references or {})
+        self.dependents_by_url = None
+
+    def set_page(self, source, references):
+        self.references[source] = list(references)
+        self.dependents_by_url = None
+
+    def remove_page(self, source):
+        self.references.pop(source, None)
+        self.dependents_by_url = None
+
+    def to_json(self):
+        return dict(sorted(self.references.items()))
+
+    def dependents(self, url):
+        if self.dependents_by_url is None:
+            self.dependents_by_url = {}
+            for source, references in self.references.items():
+                for reference in references:
+                    self.dependents_by_url.setdefault(
+                        reference, set()).add(source)
+        return sorted(self.dependents_by_url.get(normalize_url(url), ()))
+
+    def rebuild_set(self, changes, pages):
+        # Pages embed the template but only link to other pages and
+        # assets, so a page is rebuilt when its own source or the template
+        # changed. Removed link targets are reported, not rebuilt.
+        if TEMPLATE in changes:
+            return set(pages)
+        return {source for source in changes if source in pages}
+
+    def dependents_of_path(self, path, content_dir, static_dir, template_path):
+        abs_path = os.path.abspath(path)
+        if abs_path == os.path.abspath(template_path):
+            return sorted(self.references)
+        for root, to_url in ((content_dir, source_url),
+                             (static_dir, lambda relative: "/" + relative)):
+            abs_root = os.path.abspath(root)
+            if abs_path.startswith(abs_root + os.sep):
+                relative = os.path.relpath(abs_path, abs_root)
+                return self.dependents(to_url(relative.replace(os.sep, "/")))
+        raise Exception(
+            f"{path} is not the template or inside {content_dir}/{static_dir}")
@@ -0,0 +1,25 @@
+import os
+import tempfile
+
+# Shared by the test modules; not named test_* so that unittest discovery
+# does not load it as a test module.
+
+
+def temp_dir(test):
+    # A temporary directory that is removed when the test finishes.
+    tmp = tempfile.TemporaryDirectory()
+    test.addCleanup(tmp.cleanup)
+    return tmp.name
+
+
+def write_file(path, text, mtime=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def read_file(path):
+    with open(path, "r") as f:
+        return f.read()
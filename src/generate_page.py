@@ -1,10 +1,100 @@
 import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-from block_markdown import extract_title
-from htmlnode import markdown_to_html_node
+from block_markdown import extract_title, find_title
+from depgraph import (TEMPLATE, DependencyGraph, normalize_references,
+                      normalize_url, page_references, source_url,
+                      template_references)
+from htmlnode import (INLINE_MEMO, LeafNode, markdown_lines_to_html_node,
+                      markdown_to_html_node)
+from inline_memo import DEFAULT_MAX_ENTRIES
+from manifest import hash_file, load_manifest, save_manifest
+from output import remove_output, replace_if_changed, write_output
+from parse_cache import DEFAULT_MAX_BYTES, ParseCache
+from scan import scan_tree, tree_files
+from search_index import (IndexedNode, PageText, load_state, page_url,
+                          remove_index, save_state, state_path, update_state,
+                          write_index)
+from template import LinkRewriter, load_template
 
+# Markdown files larger than this are parsed block by block while the page
+# is written instead of being read into memory whole.
+STREAM_THRESHOLD_BYTES = 8 * 1024 * 1024
+# Pages buffered between the reader, render and writer stages of a
+# pipelined build.
+PIPELINE_QUEUE_SIZE = 64
+# A source whose size and mtime match the manifest is trusted without
+# rehashing only if that mtime is older than the previous scan by this
+# margin; files edited just before or during a build may still share
+# their mtime with a later edit (coarse filesystem timestamps).
+RACY_MTIME_NS = 2 * 10**9
 
-def generate_page(from_path, template_path, dest_path, basepath="/"):
+
+def parse_page(markdown, template, cache=None):
+    if cache is None:
+        content_node = markdown_to_html_node(markdown, template.links)
+    else:
+        key = cache.key(markdown, template.links)
+        html = cache.get(key)
+        if html is None:
+            html = markdown_to_html_node(markdown, template.links).to_html()
+            cache.put(key, html)
+        elif template.links.references is not None:
+            # Nothing was rendered, so the references are read instead.
+            template.links.record(page_references(markdown.splitlines()))
+        content_node = LeafNode(None, html)
+    title = extract_title(markdown)
+    return title, content_node
+
+
+def render_page(markdown, template):
+    title, content_node = parse_page(markdown, template)
+    chunks = []
+    template.render_to(chunks.append, title, content_node)
+    return "".join(chunks)
+
+
+def read_markdown(from_path):
+    with open(from_path, "r") as f:
+        return f.read()
+
+
+def write_page(dest_path, template, title, content_node):
+    dest_dir_path = os.path.dirname(dest_path)
+    if dest_dir_path != "":
+        os.makedirs(dest_dir_path, exist_ok=True)
+
+    tmp_path = f"{dest_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            template.render_to(f.write, title, content_node)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return replace_if_changed(tmp_path, dest_path)
+
+
+def index_content(content_node, title, page_text):
+    if page_text is None:
+        return content_node
+    page_text.title = title
+    return IndexedNode(content_node, page_text)
+
+
+def generate_page(from_path,
+                  template_path,
+                  dest_path,
+                  basepath="/",
+                  template=None,
+                  cache=None,
+                  page_text=None,
+                  assets=None,
+                  images=None,
+                  minify=False,
+                  references=None):
     print(f"Generating page from {from_path} to {
           dest_path} using {template_path}")
 
@@ -12,47 +102,453 @@ def generate_page(from_path, template_path, dest_path, basepath="/"):
     abs_template_path = os.path.abspath(template_path)
     abs_dest_path = os.path.abspath(dest_path)
 
-    with open(abs_from_path, "r") as f:
-        markdown = f.read()
+    if template is None:
+        template = load_template(abs_template_path, basepath, assets, images,
+                                 minify)
 
-    with open(abs_template_path, "r") as f:
-        template = f.read()
+    # The root-relative URLs the page links to are added to references
+    # while it renders, so the dependency graph needs no second parse.
+    template.links.references = references
+    try:
+        if os.path.getsize(abs_from_path) > STREAM_THRESHOLD_BYTES:
+            with open(abs_from_path, "r") as f:
+                title = find_title(f)
+                f.seek(0)
+                content_node = markdown_lines_to_html_node(f, template.links)
+                content_node = index_content(content_node, title, page_text)
+                return write_page(abs_dest_path, template, title,
+                                  content_node)
 
-    converted_markdown = markdown_to_html_node(markdown).to_html()
-    title = extract_title(markdown)
+        markdown = read_markdown(abs_from_path)
+        title, content_node = parse_page(markdown, template, cache)
+        content_node = index_content(content_node, title, page_text)
+        return write_page(abs_dest_path, template, title, content_node)
+    finally:
+        template.links.references = None
 
-    template = template.replace("{{ Title }}", title)
-    template = template.replace("{{ Content }}", converted_markdown)
-    template = template.replace('href="/', f'href="{basepath}')
-    template = template.replace('src="/', f'src="{basepath}')
 
-    dest_dir_path = os.path.dirname(abs_dest_path)
-    if dest_dir_path != "":
-        os.makedirs(dest_dir_path, exist_ok=True)
+def generate_page_recursive(dir_path_content,
+                            template_path,
+                            dest_dir_path,
+                            basepath="/",
+                            template=None):
+    abs_template_path = os.path.abspath(template_path)
+    if template is None:
+        template = load_template(abs_template_path, basepath)
 
-    with open(abs_dest_path, "w") as f:
-        f.write(template)
+    for from_path, dest_path in find_pages(dir_path_content, dest_dir_path):
+        generate_page(from_path, abs_template_path, dest_path, basepath,
+                      template)
 
 
-def generate_page_recursive(dir_path_content,
+def find_pages(dir_path_content, dest_dir_path, tree=None):
+    abs_dir_path_content = os.path.abspath(dir_path_content)
+    abs_dest_dir_path = os.path.abspath(dest_dir_path)
+    if tree is None:
+        tree = scan_tree(abs_dir_path_content)
+
+    # Sorting by path components walks each directory in name order,
+    # depth first.
+    pages = []
+    for relative in sorted(tree_files(tree),
+                           key=lambda relative: relative.split(os.sep)):
+        output = os.path.splitext(relative)[0] + ".html"
+        pages.append((os.path.join(abs_dir_path_content, relative),
+                      os.path.join(abs_dest_dir_path, output)))
+    return pages
+
+
+def remove_pages(old_pages, new_pages, dest_dir_path, graph):
+    # Removes the outputs of pages whose sources were deleted.
+    abs_dest_dir_path = os.path.abspath(dest_dir_path)
+    removed = 0
+    for source, entry in old_pages.items():
+        if source in new_pages:
+            continue
+        output_path = os.path.join(abs_dest_dir_path, entry["output"])
+        print(f"Removing {output_path} (source {source} was deleted)")
+        remove_output(output_path, abs_dest_dir_path)
+        graph.remove_page(source)
+        for dependent in graph.dependents(source_url(source)):
+            print(f"Warning: {dependent} links to removed page {source}")
+        removed += 1
+    return removed
+
+
+def make_template_entry(template_path, basepath, minify=False):
+    # Pages are rendered again whenever this entry changes.
+    entry = {
+        "hash": hash_file(template_path),
+        "basepath": basepath,
+    }
+    if minify:
+        entry["minify"] = True
+    return entry
+
+
+def shard_pages(pages, jobs):
+    shards = [[] for _ in range(jobs)]
+    loads = [0] * jobs
+    sized = sorted(((os.path.getsize(page[0]), page) for page in pages),
+                   key=lambda item: item[0], reverse=True)
+    for size, page in sized:
+        i = loads.index(min(loads))
+        shards[i].append(page)
+        loads[i] += size
+    return [shard for shard in shards if shard]
+
+
+def open_cache(cache_dir, cache_size=DEFAULT_MAX_BYTES):
+    if cache_dir is None:
+        return None
+    return ParseCache(cache_dir, cache_size)
+
+
+def generate_shard(shard,
+                   template_path,
+                   basepath="/",
+                   cache_dir=None,
+                   cache_size=DEFAULT_MAX_BYTES,
+                   memo_size=DEFAULT_MAX_ENTRIES,
+                   search=False,
+                   assets=None,
+                   images=None,
+                   minify=False):
+    start = time.perf_counter()
+    INLINE_MEMO.resize(memo_size)
+    template = load_template(template_path, basepath, assets, images,
+                             minify)
+    cache = open_cache(cache_dir, cache_size)
+    changed = 0
+    entries = {}
+    references = {}
+    for from_path, dest_path in shard:
+        page_text = PageText() if search else None
+        page_urls = set()
+        changed += generate_page(from_path, template_path, dest_path,
+                                 basepath, template, cache, page_text,
+                                 references=page_urls)
+        if page_text:
+            entries[from_path] = page_text.entry()
+        references[from_path] = normalize_references(page_urls)
+    stats = cache.stats() if cache else None
+    return (os.getpid(), len(shard), changed, time.perf_counter() - start,
+            stats, INLINE_MEMO.stats(), entries, references)
+
+
+def generate_pages_parallel(pages,
                             template_path,
-                            dest_dir_path,
-                            basepath="/"):
+                            basepath="/",
+                            jobs=None,
+                            cache_dir=None,
+                            cache_size=DEFAULT_MAX_BYTES,
+                            memo_size=DEFAULT_MAX_ENTRIES,
+                            entries=None,
+                            assets=None,
+                            images=None,
+                            minify=False,
+                            references=None):
+    jobs = jobs or os.cpu_count() or 1
+    shards = shard_pages(pages, jobs)
+    if not shards:
+        return 0
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+        futures = [executor.submit(generate_shard, shard, template_path,
+                                   basepath, cache_dir, cache_size,
+                                   memo_size, entries is not None, assets,
+                                   images, minify)
+                   for shard in shards]
+        results = [future.result() for future in futures]
+
+    changed = 0
+    for i, (pid, count, shard_changed, elapsed, stats, memo_stats,
+            shard_entries, shard_references) in enumerate(results):
+        changed += shard_changed
+        if entries is not None:
+            entries.update(shard_entries)
+        if references is not None:
+            references.update(shard_references)
+        cache_report = f", parse cache {stats}" if stats else ""
+        memo_report = f", inline memo {memo_stats}" if memo_size > 0 else ""
+        print(f"Worker {i} (pid {pid}): {count} pages in {elapsed:.3f}s"
+              f"{cache_report}{memo_report}")
+    print(f"Generated {len(pages)} pages with {len(shards)} workers in "
+          f"{time.perf_counter() - start:.3f}s")
+    return changed
+
+
+def generate_pages_pipelined(pages,
+                             template_path,
+                             basepath="/",
+                             cache_dir=None,
+                             cache_size=DEFAULT_MAX_BYTES,
+                             entries=None,
+                             assets=None,
+                             images=None,
+                             minify=False,
+                             references=None):
+    template = load_template(template_path, basepath, assets, images,
+                             minify)
+    cache = open_cache(cache_dir, cache_size)
+    reads = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    writes = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    stop = threading.Event()
+    errors = []
+    # Pages written by the writer thread and pages streamed by the render
+    # loop, counted separately so neither stage races the other.
+    changed = [0, 0]
+
+    # Every blocking queue call wakes up regularly so that a failure in
+    # any stage shuts the other stages down instead of deadlocking them.
+    def put(stage_queue, item):
+        while not stop.is_set():
+            try:
+                stage_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def get(stage_queue):
+        while not stop.is_set():
+            try:
+                return stage_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def reader():
+        try:
+            for from_path, dest_path in pages:
+                if stop.is_set():
+                    return
+                markdown = None
+                if os.path.getsize(from_path) <= STREAM_THRESHOLD_BYTES:
+                    markdown = read_markdown(from_path)
+                put(reads, (from_path, dest_path, markdown))
+            put(reads, None)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    def writer():
+        try:
+            while True:
+                item = get(writes)
+                if item is None:
+                    return
+                changed[0] += write_output(*item)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    threads = [threading.Thread(target=reader),
+               threading.Thread(target=writer)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = get(reads)
+            if item is None:
+                break
+            from_path, dest_path, markdown = item
+            page_text = PageText() if entries is not None else None
+            page_urls = set()
+            if markdown is None:
+                # Too large to hand over in memory; stream it in place.
+                changed[1] += generate_page(from_path, template_path,
+                                            dest_path, basepath, template,
+                                            page_text=page_text,
+                                            references=page_urls)
+            else:
+                print(f"Generating page from {from_path} to {
+                      dest_path} using {template_path}")
+                template.links.references = page_urls
+                try:
+                    title, content_node = parse_page(markdown, template,
+                                                     cache)
+                    content_node = index_content(content_node, title,
+                                                 page_text)
+                    chunks = []
+                    template.render_to(chunks.append, title, content_node)
+                finally:
+                    template.links.references = None
+                put(writes, (dest_path, "".join(chunks)))
+            if page_text:
+                entries[from_path] = page_text.entry()
+            if references is not None:
+                references[from_path] = normalize_references(page_urls)
+        put(writes, None)
+    except Exception:
+        stop.set()
+        raise
+    finally:
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+    if cache:
+        print(f"Parse cache: {cache.stats()}")
+    if INLINE_MEMO.max_entries > 0:
+        print(f"Inline memo: {INLINE_MEMO.stats()}")
+    return sum(changed)
+
+
+def asset_changes(old_assets, new_assets, graph, template_path):
+    # Pages only embed an asset's entry (its fingerprinted URL, or an
+    # image's size and variants), so a changed entry rebuilds the pages
+    # that reference the asset, or every page if the template does.
+    changed = sorted(url for url in old_assets.keys() | new_assets.keys()
+                     if old_assets.get(url) != new_assets.get(url))
+    if not changed:
+        return set()
+    with open(template_path, "r") as f:
+        template_urls = set(template_references(f.read()))
+    changes = set()
+    for url in changed:
+        if normalize_url(url) in template_urls:
+            changes.add(TEMPLATE)
+        changes.update(graph.dependents(url))
+    return changes
+
+
+def generate_pages_incremental(dir_path_content,
+                               template_path,
+                               dest_dir_path,
+                               manifest_path,
+                               basepath="/",
+                               jobs=1,
+                               cache_dir=None,
+                               cache_size=DEFAULT_MAX_BYTES,
+                               pipeline=False,
+                               memo_size=DEFAULT_MAX_ENTRIES,
+                               tree=None,
+                               search=False,
+                               assets=None,
+                               images=None,
+                               minify=False):
+    INLINE_MEMO.resize(memo_size)
     abs_dir_path_content = os.path.abspath(dir_path_content)
     abs_template_path = os.path.abspath(template_path)
     abs_dest_dir_path = os.path.abspath(dest_dir_path)
 
-    content_list = os.listdir(abs_dir_path_content)
-    for item in content_list:
-        path = os.path.join(abs_dir_path_content, item)
-        if os.path.isfile(path):
-            item_name = os.path.splitext(item)[0]
-            item_html = item_name + ".html"
-            output_path = os.path.join(abs_dest_dir_path, item_html)
-            generate_page(path, abs_template_path, output_path, basepath)
-        elif os.path.isdir(path):
-            new_target = os.path.join(abs_dest_dir_path, item)
-            if not os.path.exists(new_target):
-                os.mkdir(new_target)
-            generate_page_recursive(
-                path, abs_template_path, new_target, basepath)
+    manifest = load_manifest(manifest_path)
+    old_pages = manifest["pages"]
+    old_scan_ns = manifest.get("scan_ns", 0)
+    scan_ns = time.time_ns()
+    new_pages = {}
+    graph = DependencyGraph(manifest.get("dependencies"))
+    template_entry = make_template_entry(abs_template_path, basepath, minify)
+
+    changes = set()
+    if manifest.get("template") != template_entry:
+        changes.add(TEMPLATE)
+    assets = assets or {}
+    images = images or {}
+    changes.update(asset_changes(manifest.get("asset_urls") or {}, assets,
+                                 graph, abs_template_path))
+    changes.update(asset_changes(manifest.get("image_urls") or {}, images,
+                                 graph, abs_template_path))
+    if tree is None:
+        tree = scan_tree(abs_dir_path_content)
+    pages = {}
+    for from_path, dest_path in find_pages(abs_dir_path_content,
+                                           abs_dest_dir_path, tree):
+        source = os.path.relpath(from_path, abs_dir_path_content)
+        size, mtime_ns, _ = tree[source]
+        old_entry = old_pages.get(source, {})
+        if (old_entry.get("size") == size and
+                old_entry.get("mtime_ns") == mtime_ns and
+                mtime_ns < old_scan_ns - RACY_MTIME_NS):
+            content_hash = old_entry["content_hash"]
+        else:
+            content_hash = hash_file(from_path)
+        entry = {
+            "content_hash": content_hash,
+            "output": os.path.relpath(dest_path, abs_dest_dir_path),
+            "size": size,
+            "mtime_ns": mtime_ns,
+        }
+        modified = (old_entry.get("content_hash") != content_hash or
+                    old_entry.get("output") != entry["output"])
+        if modified or not os.path.exists(dest_path):
+            changes.add(source)
+        new_pages[source] = entry
+        pages[source] = (from_path, dest_path)
+
+    # Pages are indexed while they are rendered, so pages missing from the
+    # search index are rendered again even if their output is current.
+    entries = None
+    if search:
+        search_state_path = state_path(manifest_path)
+        search_state = load_state(search_state_path)
+        changes.update(pages.keys() - search_state["pages"].keys())
+        entries = {}
+
+    rebuild = graph.rebuild_set(changes, pages)
+    dirty = [pages[source] for source in sorted(rebuild)]
+    skipped = len(pages) - len(dirty)
+
+    # The references of every rendered page, collected while rendering.
+    references = {}
+    changed = 0
+    if jobs > 1 and len(dirty) > 1:
+        changed = generate_pages_parallel(dirty, abs_template_path, basepath,
+                                          jobs, cache_dir, cache_size,
+                                          memo_size, entries, assets, images,
+                                          minify, references)
+    elif pipeline and dirty:
+        changed = generate_pages_pipelined(dirty, abs_template_path,
+                                           basepath, cache_dir, cache_size,
+                                           entries, assets, images, minify,
+                                           references)
+    elif dirty:
+        template = load_template(abs_template_path, basepath, assets,
+                                 images, minify)
+        cache = open_cache(cache_dir, cache_size)
+        for from_path, dest_path in dirty:
+            page_text = PageText() if search else None
+            page_urls = set()
+            changed += generate_page(from_path, abs_template_path,
+                                     dest_path, basepath, template, cache,
+                                     page_text, references=page_urls)
+            if page_text:
+                entries[from_path] = page_text.entry()
+            references[from_path] = normalize_references(page_urls)
+        if cache:
+            print(f"Parse cache: {cache.stats()}")
+        if memo_size > 0:
+            print(f"Inline memo: {INLINE_MEMO.stats()}")
+
+    for source in sorted(rebuild):
+        graph.set_page(source, references[pages[source][0]])
+
+    removed = remove_pages(old_pages, new_pages, abs_dest_dir_path, graph)
+
+    if search:
+        indexed = {}
+        for source, (from_path, _) in pages.items():
+            entry = entries.get(from_path)
+            if entry is not None:
+                entry["path"] = page_url(new_pages[source]["output"])
+                indexed[source] = entry
+        update_state(search_state, indexed, pages.keys())
+        write_index(search_state, abs_dest_dir_path, LinkRewriter(basepath))
+        save_state(search_state_path, search_state)
+    else:
+        remove_index(state_path(manifest_path), abs_dest_dir_path)
+
+    manifest["pages"] = new_pages
+    manifest["scan_ns"] = scan_ns
+    manifest["template"] = template_entry
+    manifest["asset_urls"] = assets
+    manifest["image_urls"] = images
+    manifest["dependencies"] = graph.to_json()
+    save_manifest(manifest_path, manifest)
+    # Later callers in this process render without the memo again.
+    INLINE_MEMO.resize(0)
+    print(f"Generated {len(dirty)} pages ({changed} changed on disk), "
+          f"skipped {skipped} unchanged, removed {removed}")
@@ -1,9 +1,22 @@
-from block_markdown import BlockType, block_to_block_type, markdown_to_blocks
+from block_markdown import (BlockType, classify_block, iter_blocks,
+                            markdown_to_blocks)
 from inline_markdown import text_to_textnodes
+from inline_memo import InlineMemo
 from textnode import TextNode, TextType
 
 
+# Rendered inline HTML of paragraphs, headings, list items and quotes,
+# shared by every page rendered in this process. It is off until a build,
+# watch or serve session sizes it, so library callers always get the same
+# node tree.
+INLINE_MEMO = InlineMemo(0)
+
+
 class HTMLNode:
+    # Every inline fragment of every page becomes a node, so instances
+    # carry no per-instance __dict__.
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag
         self.value = value
@@ -13,14 +26,15 @@ class HTMLNode:
     def to_html(self):
         raise NotImplementedError
 
+    def write_html(self, write):
+        raise NotImplementedError
+
     def props_to_html(self):
-        string = ""
         if not self.props or not isinstance(self.props, dict):
             raise Exception("No props provided")
 
-        for key in self.props:
-            string += (f' {key}="{self.props[key]}"')
-        return string
+        return "".join(f' {key}="{value}"'
+                       for key, value in self.props.items())
 
     def __eq__(self, other):
         return (self.tag == other.tag and
@@ -34,6 +48,8 @@ class HTMLNode:
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, props=None):
         super().__init__(tag, value, None, props)
 
@@ -50,12 +66,38 @@ class LeafNode(HTMLNode):
                 text_props = ""
             return f'<{self.tag}{text_props}>{self.value}</{self.tag}>'
 
+    def write_html(self, write):
+        write(self.to_html())
+
+
+class VoidNode(LeafNode):
+    # An element without contents or end tag, such as img, for compact
+    # output.
+    __slots__ = ()
+
+    def __init__(self, tag, props=None):
+        super().__init__(tag, "", props)
+
+    def to_html(self):
+        if self.props is not None:
+            text_props = self.props_to_html()
+        else:
+            text_props = ""
+        return f"<{self.tag}{text_props}>"
+
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
         super().__init__(tag, None, children, props)
 
     def to_html(self):
+        chunks = []
+        self.write_html(chunks.append)
+        return "".join(chunks)
+
+    def write_html(self, write):
         if self.tag is None:
             raise ValueError("A tag must be provided")
         if self.children is None:
@@ -66,14 +108,13 @@ class ParentNode(HTMLNode):
         else:
             text_props = ""
 
-        string = ""
+        write(f"<{self.tag}{text_props}>")
         for child in self.children:
-            string += child.to_html()
-
-        return f"<{self.tag}{text_props}>{string}</{self.tag}>"
+            child.write_html(write)
+        write(f"</{self.tag}>")
 
 
-def text_node_to_html_node(text_node):
+def text_node_to_html_node(text_node, links=None):
     match text_node.text_type:
         case TextType.TEXT:
             return LeafNode(None, text_node.text)
@@ -84,62 +125,97 @@ def text_node_to_html_node(text_node):
         case TextType.CODE:
             return LeafNode("code", text_node.text)
         case TextType.LINK:
-            return LeafNode("a", text_node.text, {"href": text_node.url})
+            url = links.rewrite(text_node.url) if links else text_node.url
+            return LeafNode("a", text_node.text, {"href": url})
         case TextType.IMAGE:
-            return LeafNode("img",
-                            "",
-                            {"src": text_node.url, "alt": text_node.text})
+            url = links.rewrite(text_node.url) if links else text_node.url
+            props = {"src": url, "alt": text_node.text}
+            if links and links.images:
+                props.update(links.image_attributes(text_node.url))
+            if links and links.minify:
+                return VoidNode("img", props)
+            return LeafNode("img", "", props)
         case _:
             raise Exception("TextType not recognized")
 
 
-def markdown_to_html_node(markdown):
+def markdown_to_html_node(markdown, links=None):
     blocks = markdown_to_blocks(markdown)
     children = []
     for block in blocks:
-        html_node = block_to_html_node(block)
+        html_node = block_to_html_node(block, links)
         children.append(html_node)
     return ParentNode("div", children, None)
 
 
-def text_to_children(text):
+def iter_html_nodes(lines, links=None):
+    for block, block_type, block_lines in iter_blocks(lines):
+        yield block_to_html_node(block, links, block_type, block_lines)
+
+
+def markdown_lines_to_html_node(lines, links=None):
+    # The children are produced while the node is written, so only one
+    # block of the document is held in memory at a time.
+    return ParentNode("div", iter_html_nodes(lines, links), None)
+
+
+def text_to_children(text, links=None):
+    # Memo entries are (html, root-relative link and image URLs).
+    entry, key = INLINE_MEMO.lookup(text, links)
+    if entry is not None:
+        html, references = entry
+        if links:
+            links.record(references)
+        return [LeafNode(None, html)]
+
     text_nodes = text_to_textnodes(text)
+    references = [node.url for node in text_nodes
+                  if node.text_type in (TextType.IMAGE, TextType.LINK) and
+                  node.url.startswith("/")]
+    if links:
+        links.record(references)
     html_nodes = []
     for node in text_nodes:
-        html_nodes.append(text_node_to_html_node(node))
-    return html_nodes
+        html_nodes.append(text_node_to_html_node(node, links))
+    if key is None:
+        return html_nodes
+
+    html = "".join(node.to_html() for node in html_nodes)
+    INLINE_MEMO.put(key, (html, references))
+    return [LeafNode(None, html)]
 
 
-def block_to_html_node(block):
-    block_type = block_to_block_type(block)
+def block_to_html_node(block, links=None, block_type=None, lines=None):
+    if block_type is None:
+        block_type, lines = classify_block(block)
     match block_type:
         case BlockType.PARAGRAPH:
-            return paragraph_to_html_node(block)
+            return paragraph_to_html_node(lines, links)
         case BlockType.HEADING:
-            return heading_to_html_node(block)
+            return heading_to_html_node(block, links)
         case BlockType.CODE:
             return code_to_html_node(block)
         case BlockType.ORDERED_LIST:
-            return ordered_list_to_html_node(block)
+            return ordered_list_to_html_node(lines, links)
         case BlockType.UNORDERED_LIST:
-            return unordered_list_to_html_node(block)
+            return unordered_list_to_html_node(lines, links)
         case BlockType.QUOTE:
-            return quote_to_html_node(block)
+            return quote_to_html_node(lines, links)
         case _:
             raise ValueError("invalid block type")
 
 
-def paragraph_to_html_node(block):
-    lines = block.split("\n")
+def paragraph_to_html_node(lines, links=None):
     paragraph = " ".join(lines)
-    children = text_to_children(paragraph)
+    children = text_to_children(paragraph, links)
     return ParentNode("p", children)
 
 
-def heading_to_html_node(block):
-    count = len(block) - len(block.lstrip("#"))
-    text = block.lstrip("#").lstrip()
-    children = text_to_children(text)
+def heading_to_html_node(block, links=None):
+    text = block.lstrip("#")
+    count = len(block) - len(text)
+    text = text.lstrip()
+    children = text_to_children(text, links)
     return ParentNode(f"h{count}", children)
 
 
@@ -150,34 +226,31 @@ def code_to_html_node(block):
     return ParentNode("pre", [ParentNode("code", [html_node])])
 
 
-def ordered_list_to_html_node(block):
-    lines = block.split("\n")
+def ordered_list_to_html_node(lines, links=None):
     children = []
     for line in lines:
         text = line.lstrip().split(" ", 1)[1]
-        line_children = text_to_children(text)
+        line_children = text_to_children(text, links)
         li_node = ParentNode("li", line_children)
         children.append(li_node)
     return ParentNode("ol", children)
 
 
-def unordered_list_to_html_node(block):
-    lines = block.split("\n")
+def unordered_list_to_html_node(lines, links=None):
     children = []
     for line in lines:
         text = line.lstrip().lstrip("*-+").lstrip()
-        line_children = text_to_children(text)
+        line_children = text_to_children(text, links)
         li_node = ParentNode("li", line_children)
         children.append(li_node)
     return ParentNode("ul", children)
 
 
-def quote_to_html_node(block):
-    lines = block.split("\n")
+def quote_to_html_node(lines, links=None):
     quote_lines = []
     for line in lines:
         text = line.lstrip().split(">", 1)[1].lstrip()
         quote_lines.append(text)
     full_quote = " ".join(quote_lines)
-    children = text_to_children(full_quote)
+    children = text_to_children(full_quote, links)
     return ParentNode("blockquote", children)
@@ -0,0 +1,364 @@
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+
+from copy_content import copy_files, is_unchanged
+from manifest import hash_file
+from output import remove_output, write_atomic
+
+IMAGE_CACHE_DIR = ".image-cache"
+# A variant is made at each of these widths that is narrower than the
+# original.
+VARIANT_WIDTHS = (480, 960)
+# Part of every cache file name; bump it whenever the variants made from
+# a source change.
+PIPELINE_VERSION = 1
+IMAGE_WORKERS = os.cpu_count() or 1
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Bytes per pixel of the 8-bit color types that are decoded: greyscale,
+# RGB, greyscale with alpha and RGBA. Other PNGs only get their size.
+CHANNELS = {0: 1, 2: 3, 4: 2, 6: 4}
+# Color space chunks that are carried over to the variants.
+COLOR_CHUNKS = {b"gAMA", b"cHRM", b"sRGB", b"iCCP"}
+
+
+def read_chunks(data):
+    if not data.startswith(PNG_SIGNATURE):
+        raise Exception("Error: not a PNG file")
+    position = len(PNG_SIGNATURE)
+    while position + 8 <= len(data):
+        length, kind = struct.unpack(">I4s", data[position:position + 8])
+        if position + 12 + length > len(data):
+            raise Exception(f"Error: truncated PNG chunk {kind!r}")
+        yield kind, data[position + 8:position + 8 + length]
+        position += 12 + length
+
+
+def chunk(kind, body):
+    return (struct.pack(">I", len(body)) + kind + body +
+            struct.pack(">I", zlib.crc32(kind + body)))
+
+
+def png_header(path):
+    # (width, height, bit depth, color type, interlace method)
+    with open(path, "rb") as f:
+        kind, body = next(read_chunks(f.read(33)), (None, b""))
+    if kind != b"IHDR" or len(body) != 13:
+        raise Exception(f"Error: {path} does not start with a PNG header")
+    width, height, depth, color_type, _, _, interlace = struct.unpack(
+        ">IIBBBBB", body)
+    return width, height, depth, color_type, interlace
+
+
+def decodable(header):
+    _, _, depth, color_type, interlace = header
+    return depth == 8 and color_type in CHANNELS and interlace == 0
+
+
+# Rows are filtered and unfiltered a whole row at a time by treating it as
+# one little-endian integer and adding or subtracting all of its bytes at
+# once (modulo 256 each). The low 7 bits of every byte are combined
+# separately from the top bit so no carry or borrow crosses a byte.
+def byte_masks(length):
+    return (int.from_bytes(b"\x7f" * length, "little"),
+            int.from_bytes(b"\x80" * length, "little"))
+
+
+def add_bytes(a, b, low, high):
+    return ((a & low) + (b & low)) ^ ((a ^ b) & high)
+
+
+def subtract_bytes(a, b, low, high):
+    return ((a | high) - (b & low)) ^ ((a ^ ~b) & high)
+
+
+def unfilter(kind, line, previous, bpp, masks):
+    stride = len(line)
+    if kind == 0:
+        return line
+    if kind == 1:
+        # Sub: a running sum of each byte and the one bpp bytes before
+        # it, done in log2(width) whole-row steps.
+        low, high = masks
+        row = int.from_bytes(line, "little")
+        row_mask = (1 << 8 * stride) - 1
+        shift = 8 * bpp
+        while shift < 8 * stride:
+            row = add_bytes(row, (row << shift) & row_mask, low, high)
+            shift *= 2
+        return row.to_bytes(stride, "little")
+    if kind == 2:
+        row = add_bytes(int.from_bytes(line, "little"),
+                        int.from_bytes(previous, "little"), *masks)
+        return row.to_bytes(stride, "little")
+
+    row = bytearray(line)
+    if kind == 3:
+        for i in range(bpp):
+            row[i] = (row[i] + (previous[i] >> 1)) & 0xFF
+        for i in range(bpp, stride):
+            row[i] = (row[i] + ((row[i - bpp] + previous[i]) >> 1)) & 0xFF
+    elif kind == 4:
+        for i in range(bpp):
+            row[i] = (row[i] + previous[i]) & 0xFF
+        for i in range(bpp, stride):
+            a = row[i - bpp]
+            b = previous[i]
+            c = previous[i - bpp]
+            pa = abs(b - c)
+            pb = abs(a - c)
+            pc = abs(a + b - c - c)
+            if pa <= pb and pa <= pc:
+                predictor = a
+            elif pb <= pc:
+                predictor = b
+            else:
+                predictor = c
+            row[i] = (row[i] + predictor) & 0xFF
+    else:
+        raise Exception(f"Error: unknown PNG filter type {kind}")
+    return bytes(row)
+
+
+def decode_png(data):
+    # Returns (width, height, color type, rows, color chunks), or None for
+    # PNGs that are not decoded.
+    header = None
+    idat = []
+    color_chunks = []
+    for kind, body in read_chunks(data):
+        if kind == b"IHDR":
+            header = struct.unpack(">IIBBBBB", body)
+        elif kind == b"IDAT":
+            idat.append(body)
+        elif kind in COLOR_CHUNKS:
+            color_chunks.append((kind, body))
+        elif kind == b"IEND":
+            break
+    if header is None:
+        raise Exception("Error: PNG file has no header")
+    width, height, depth, color_type, _, _, interlace = header
+    if not decodable((width, height, depth, color_type, interlace)):
+        return None
+
+    bpp = CHANNELS[color_type]
+    stride = width * bpp
+    masks = byte_masks(stride)
+    raw = zlib.decompress(b"".join(idat))
+    rows = []
+    previous = bytes(stride)
+    for y in range(height):
+        start = y * (stride + 1)
+        previous = unfilter(raw[start], raw[start + 1:start + 1 + stride],
+                            previous, bpp, masks)
+        rows.append(previous)
+    return width, height, color_type, rows, color_chunks
+
+
+def encode_png(width, height, color_type, rows, color_chunks=()):
+    # Every row gets the same filter: whichever of None, Sub and Up
+    # compresses best at a fast level. Only that one gets the slow level.
+    bpp = CHANNELS[color_type]
+    stride = width * bpp
+    low, high = byte_masks(stride)
+    row_mask = (1 << 8 * stride) - 1
+    streams = []
+    for kind in (0, 1, 2):
+        lines = []
+        previous = 0
+        for row in rows:
+            value = int.from_bytes(row, "little")
+            if kind == 1:
+                row = subtract_bytes(value, (value << 8 * bpp) & row_mask,
+                                     low, high).to_bytes(stride, "little")
+            elif kind == 2:
+                row = subtract_bytes(value, previous, low,
+                                     high).to_bytes(stride, "little")
+                previous = value
+            lines.append(bytes((kind,)) + row)
+        streams.append(b"".join(lines))
+    best = min(streams, key=lambda stream: len(zlib.compress(stream, 1)))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)
+    return (PNG_SIGNATURE + chunk(b"IHDR", header) +
+            b"".join(chunk(kind, body) for kind, body in color_chunks) +
+            chunk(b"IDAT", zlib.compress(best, 9)) + chunk(b"IEND", b""))
+
+
+def resize(rows, width, bpp, new_width, new_height):
+    # Box filter: every output pixel is the mean of the source pixels it
+    # covers. Rows are summed column-wise first, then each channel of the
+    # summed row is averaged over spans of a running sum.
+    height = len(rows)
+    starts = [x * width // new_width for x in range(new_width)]
+    ends = [max(start + 1, (x + 1) * width // new_width)
+            for x, start in enumerate(starts)]
+    spans = [end - start for start, end in zip(starts, ends)]
+    resized = []
+    for y in range(new_height):
+        y0 = y * height // new_height
+        y1 = max(y0 + 1, (y + 1) * height // new_height)
+        if y1 - y0 == 1:
+            sums = rows[y0]
+        else:
+            sums = [sum(column) for column in zip(*rows[y0:y1])]
+        counts = [span * (y1 - y0) for span in spans]
+        line = bytearray(new_width * bpp)
+        for channel in range(bpp):
+            totals = [0, *accumulate(sums[channel::bpp])]
+            line[channel::bpp] = bytes(
+                (totals[end] - totals[start] + count // 2) // count
+                for start, end, count in zip(starts, ends, counts))
+        resized.append(bytes(line))
+    return resized
+
+
+def variant_widths(width):
+    return [variant for variant in VARIANT_WIDTHS if variant < width]
+
+
+def variant_height(width, height, variant):
+    return max(1, round(height * variant / width))
+
+
+def variant_name(name, width):
+    root, extension = os.path.splitext(name)
+    return f"{root}-{width}w{extension}"
+
+
+def cache_path(cache_dir, digest, width):
+    return os.path.join(cache_dir,
+                        f"{digest}-{width}w-v{PIPELINE_VERSION}.png")
+
+
+def make_variants(source, digest, widths, cache_dir):
+    with open(source, "rb") as f:
+        width, height, color_type, rows, color_chunks = decode_png(f.read())
+    for variant in widths:
+        variant_rows = resize(rows, width, CHANNELS[color_type], variant,
+                              variant_height(width, height, variant))
+        write_atomic(cache_path(cache_dir, digest, variant),
+                     encode_png(variant, len(variant_rows), color_type,
+                                variant_rows, color_chunks))
+    return source
+
+
+def try_make_variants(source, digest, widths, cache_dir):
+    # Returns the error instead of raising it, so that one broken image
+    # does not stop the others.
+    try:
+        make_variants(source, digest, widths, cache_dir)
+    except Exception as e:
+        return str(e)
+    return None
+
+
+def scan_images(source_directory, files, previous=None):
+    # files is a scan_static listing. Returns {relative: [size, mtime_ns,
+    # digest, width, height, variant widths]} for its PNGs; only files
+    # whose size or mtime changed are read again. Files that are not
+    # PNGs after all are left out and copied like any other file.
+    abs_path_source = os.path.abspath(source_directory)
+    previous = previous or {}
+    images = {}
+    for relative, (size, mtime_ns) in files.items():
+        if not relative.lower().endswith(".png"):
+            continue
+        entry = previous.get(relative)
+        if entry is None or entry[:2] != [size, mtime_ns]:
+            source = os.path.join(abs_path_source, relative)
+            try:
+                header = png_header(source)
+            except Exception as e:
+                print(f"Warning: {source} is not a valid PNG, copying it "
+                      f"as is ({e})")
+                continue
+            widths = variant_widths(header[0]) if decodable(header) else []
+            entry = [size, mtime_ns, hash_file(source), header[0],
+                     header[1], widths]
+        images[relative] = entry
+    return images
+
+
+def process_images(source_directory,
+                   images,
+                   cache_dir=IMAGE_CACHE_DIR,
+                   workers=IMAGE_WORKERS):
+    # Variants are cached by the content hash of their source, so an image
+    # is only decoded when one of its variants is missing from the cache.
+    # Images that fail to decode lose their variants in images.
+    start = time.perf_counter()
+    abs_path_source = os.path.abspath(source_directory)
+    os.makedirs(cache_dir, exist_ok=True)
+    work = []
+    for relative, (_, _, digest, _, _, widths) in sorted(images.items()):
+        missing = [width for width in widths
+                   if not os.path.exists(cache_path(cache_dir, digest,
+                                                    width))]
+        if missing:
+            work.append((relative, (os.path.join(abs_path_source, relative),
+                                    digest, missing)))
+
+    if len(work) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers=min(workers,
+                                                 len(work))) as executor:
+            futures = [executor.submit(try_make_variants, *job, cache_dir)
+                       for _, job in work]
+            errors = [future.result() for future in futures]
+    else:
+        errors = [try_make_variants(*job, cache_dir) for _, job in work]
+    for (relative, (source, _, _)), error in zip(work, errors):
+        if error is not None:
+            print(f"Warning: could not resize {source}, serving it without "
+                  f"variants ({error})")
+            images[relative][5] = []
+    print(f"Processed images: {len(images)} PNGs, {len(work)} resized in "
+          f"{time.perf_counter() - start:.3f}s")
+
+
+def sync_variants(images,
+                  target_directory,
+                  names=None,
+                  previous_outputs=None,
+                  cache_dir=IMAGE_CACHE_DIR):
+    # Copies the cached variants next to their images (and their
+    # fingerprinted names) and returns the variant outputs.
+    abs_path_target = os.path.abspath(target_directory)
+    names = names or {}
+    pairs = []
+    outputs = []
+    for relative, (_, _, digest, _, _, widths) in images.items():
+        for width in widths:
+            output = variant_name(names.get(relative, relative), width)
+            source = cache_path(cache_dir, digest, width)
+            target = os.path.join(abs_path_target, output)
+            stat = os.stat(source)
+            if not is_unchanged(source, target, stat.st_size,
+                                stat.st_mtime_ns):
+                pairs.append((source, target))
+            outputs.append(output)
+    copy_files(pairs)
+
+    removed = 0
+    for output in set(previous_outputs or ()) - set(outputs):
+        remove_output(os.path.join(abs_path_target, output), abs_path_target)
+        removed += 1
+    print(f"Image variants: {len(outputs)} files, {len(pairs)} copied, "
+          f"{removed} removed")
+    return sorted(outputs)
+
+
+def image_urls(images, names=None):
+    # Site URL of an image -> [width, height, [[variant URL, width], ...]]
+    names = names or {}
+    urls = {}
+    for relative, (_, _, _, width, height, widths) in images.items():
+        name = "/" + names.get(relative, relative).replace(os.sep, "/")
+        urls["/" + relative.replace(os.sep, "/")] = [
+            width, height,
+            [[variant_name(name, variant), variant] for variant in widths]]
+    return urls
@@ -2,6 +2,20 @@ import re
 
 from textnode import TextNode, TextType
 
+# Link and image text holds no brackets or delimiters, and URLs hold no
+# parentheses, so a stray "[" or an emphasised word is never swallowed by
+# a later link. Delimiters inside a URL are kept as they are.
+LINK_TEXT = r"((?:[^\[\]_`*]|\*(?!\*))*)"
+LINK_URL = r"([^()]*)"
+LINK_PATTERN = re.compile(
+    rf"!\[{LINK_TEXT}\]\({LINK_URL}\)|\[{LINK_TEXT}\]\({LINK_URL}\)")
+INLINE_PATTERN = re.compile(rf"{LINK_PATTERN.pattern}|\*\*|_|`")
+DELIMITERS = {
+    "**": TextType.BOLD,
+    "_": TextType.ITALIC,
+    "`": TextType.CODE,
+}
+
 
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
     if not old_nodes:
@@ -78,7 +92,7 @@ def split_nodes_link(old_nodes):
     return new_nodes
 
 
-def text_to_textnodes(text):
+def text_to_textnodes_chained(text):
     node = [TextNode(text, TextType.TEXT)]
     bold = split_nodes_delimiter(node, "**", TextType.BOLD)
     italic = split_nodes_delimiter(bold, "_", TextType.ITALIC)
@@ -86,3 +100,69 @@ def text_to_textnodes(text):
     split_images = split_nodes_image(code)
     split_links = split_nodes_link(split_images)
     return split_links
+
+
+def link_node(match):
+    if match.group(2) is not None:
+        return TextNode(match.group(1), TextType.IMAGE, match.group(2))
+    return TextNode(match.group(3), TextType.LINK, match.group(4))
+
+
+def split_span_links(span):
+    nodes = []
+    position = 0
+    for match in LINK_PATTERN.finditer(span):
+        if match.start() > position:
+            nodes.append(TextNode(span[position:match.start()],
+                                  TextType.TEXT))
+        nodes.append(link_node(match))
+        position = match.end()
+    if position < len(span):
+        nodes.append(TextNode(span[position:], TextType.TEXT))
+    return nodes
+
+
+def tokenize_inline(text):
+    # Text between two delimited spans is emitted even when empty, and
+    # empty text around links and images is dropped, which is what the
+    # chained split_nodes_* passes produce.
+    nodes = []
+    run = []
+    position = 0
+    while True:
+        match = INLINE_PATTERN.search(text, position)
+        start = match.start() if match else len(text)
+        before = text[position:start]
+
+        if match and match.group(0) not in DELIMITERS:
+            if before:
+                run.append(TextNode(before, TextType.TEXT))
+            run.append(link_node(match))
+            position = match.end()
+            continue
+
+        if not run or before:
+            run.append(TextNode(before, TextType.TEXT))
+        nodes.extend(run)
+        run = []
+        if match is None:
+            return nodes
+
+        delimiter = match.group(0)
+        end = text.find(delimiter, match.end())
+        if end == -1:
+            raise Exception(
+                f"Invalid markdown: missing closing '{delimiter}'")
+        span = text[match.end():end]
+        if delimiter != "`" and LINK_PATTERN.search(span):
+            # Links in bold or italic text are split out of it and the
+            # rest of the span becomes plain text, as in the chained
+            # passes. Code spans are always kept literally.
+            nodes.extend(split_span_links(span))
+        else:
+            nodes.append(TextNode(span, DELIMITERS[delimiter]))
+        position = end + len(delimiter)
+
+
+def text_to_textnodes(text):
+    return tokenize_inline(text)
@@ -0,0 +1,58 @@
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 4096
+# Repeated snippets (nav lines, footers, link lists) are short; long
+# paragraphs are rarely repeated and would crowd them out.
+MAX_TEXT_LENGTH = 256
+
+
+class InlineMemo:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, text, links):
+        # Returns (entry, key): the stored entry on a hit, otherwise the key
+        # to store the rendered entry under, or None if it should not be.
+        # A fragment is only stored once it has been seen twice, so text
+        # that appears once costs a lookup but no extra serialization.
+        if len(text) > MAX_TEXT_LENGTH or self.max_entries <= 0:
+            return None, None
+        key = (text, links.cache_key()) if links else text
+        entries = self.entries
+        if key in entries:
+            entry = entries[key]
+            if entry is not None:
+                entries.move_to_end(key)
+                self.hits += 1
+                return entry, None
+            self.misses += 1
+            return None, key
+        self.misses += 1
+        entries[key] = None
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+        return None, None
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+
+    def resize(self, max_entries):
+        self.max_entries = max_entries
+        while len(self.entries) > max(max_entries, 0):
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0
+        stored = sum(entry is not None for entry in self.entries.values())
+        return (f"{self.hits} hits, {self.misses} misses "
+                f"({rate:.0%} hit rate, {stored} entries)")
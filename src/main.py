@@ -1,29 +1,254 @@
+import argparse
 import os
+from contextlib import nullcontext
 from shutil import rmtree
-import sys
 
-from copy_content import copy_content
-from generate_page import generate_page_recursive
+from assets import (ASSET_MANIFEST_NAME, asset_names, asset_urls,
+                    fingerprint_files, write_asset_manifest)
+from copy_content import scan_static, sync_content
+from depgraph import DependencyGraph
+from generate_page import generate_pages_incremental
+from images import (IMAGE_CACHE_DIR, image_urls, process_images, scan_images,
+                    sync_variants)
+from inline_memo import DEFAULT_MAX_ENTRIES
+from manifest import load_manifest, save_manifest
+from output import remove_output
+from profiler import Profiler
+from scan import scan_tree
+from serve import serve
+from shard import merge_shards, parse_shard, shard_root, shard_tree
+from watch import watch
 
+MANIFEST_PATH = ".build-manifest.json"
 
-def main():
-    args = sys.argv
 
-    if args[1]:
-        basepath = args[1]
-    else:
-        basepath = "/"
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the static site")
+    parser.add_argument("basepath", nargs="?", default="/",
+                        help="URL prefix the site is served from")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only regenerate pages whose inputs changed")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="overlap reading, rendering and writing pages "
+                        "in a single process")
+    parser.add_argument("--hash", action="store_true",
+                        help="compare static files by content when their "
+                        "mtime changed but their size did not")
+    parser.add_argument("--link", action="store_true",
+                        help="hard link static files into docs/ instead "
+                        "of copying them")
+    parser.add_argument("--jobs", "-j", type=int, default=1, metavar="N",
+                        help="render pages with N worker processes")
+    parser.add_argument("--cache-dir", metavar="DIR",
+                        help="reuse parsed pages from a shared cache in DIR")
+    parser.add_argument("--cache-size", type=int, default=256, metavar="MB",
+                        help="evict least recently used cache entries "
+                        "beyond MB megabytes (default: 256)")
+    parser.add_argument("--inline-memo-size", type=int,
+                        default=DEFAULT_MAX_ENTRIES, metavar="N",
+                        help="remember the rendered HTML of up to N repeated "
+                        "inline fragments (default: 4096, 0 disables)")
+    parser.add_argument("--profile", action="store_true",
+                        help="report time and call counts per pipeline "
+                        "stage and per page (implies --jobs 1 and no "
+                        "--pipeline)")
+    parser.add_argument("--profile-top", type=int, default=10, metavar="N",
+                        help="number of slowest pages to report")
+    parser.add_argument("--profile-json", metavar="PATH",
+                        help="also write the profile as a JSON trace")
+    parser.add_argument("--depends-on", metavar="PATH",
+                        help="list the pages that depend on PATH (a source, "
+                        "static file or the template) and exit")
+    parser.add_argument("--watch", action="store_true",
+                        help="serve docs/ and rebuild on changes")
+    parser.add_argument("--fingerprint", action="store_true",
+                        help="copy static files under content hashed names "
+                        "and point pages and the template at them")
+    parser.add_argument("--images", action="store_true",
+                        help="make narrower variants of PNG images and give "
+                        "img tags srcset, width and height")
+    parser.add_argument("--minify", action="store_true",
+                        help="collapse whitespace in the template, write "
+                        "compact HTML and minify CSS files")
+    parser.add_argument("--search-index", action="store_true",
+                        help="also write a site map and a search index, "
+                        "sharded by term prefix, to docs/search/")
+    parser.add_argument("--shard", type=parse_shard, metavar="i/N",
+                        help="render only the pages of shard i of N into "
+                        "SHARD_DIR/i-of-N (static files are left to --merge)")
+    parser.add_argument("--merge", type=int, metavar="N",
+                        help="build docs/ from the N shards in SHARD_DIR "
+                        "instead of rendering, checking every page is there")
+    parser.add_argument("--shard-dir", default="shards",
+                        help="where shard outputs live (default: shards)")
+    parser.add_argument("--serve", action="store_true",
+                        help="render pages on request instead of building "
+                        "docs/ (for previews)")
+    parser.add_argument("--port", type=int, default=8888,
+                        help="port for --watch and --serve (default: 8888)")
+    args = parser.parse_args(argv)
+    if args.shard and args.merge:
+        parser.error("--shard and --merge are separate steps")
+    if args.watch and (args.shard or args.merge):
+        parser.error("--watch rebuilds docs/ itself; it cannot be combined "
+                     "with --shard or --merge")
+    if args.merge is not None and args.merge < 1:
+        parser.error("--merge needs at least one shard")
+    return args
+
+
+def fingerprint_static(source_dir, static_tree, manifest, minify=False):
+    manifest["assets"] = fingerprint_files(
+        source_dir, scan_static(source_dir, static_tree),
+        manifest.get("assets"), minify)
+    return asset_urls(manifest["assets"])
+
+
+def scan_static_images(source_dir, static_tree, manifest):
+    manifest["images"] = scan_images(
+        source_dir, scan_static(source_dir, static_tree),
+        manifest.get("images"))
+
+
+def static_image_urls(manifest):
+    return image_urls(manifest["images"], asset_names(manifest.get("assets")))
+
+
+def sync_static(source_dir, target_dir, static_tree, args, profiler):
+    manifest = load_manifest(MANIFEST_PATH)
+    previous_static = manifest.get("static") or {}
+    previous_names = asset_names(manifest.get("assets"))
+    assets = None
+    if args.fingerprint:
+        assets = fingerprint_static(source_dir, static_tree, manifest,
+                                    args.minify)
+        write_asset_manifest(target_dir, assets)
+    elif manifest.pop("assets", None):
+        remove_output(os.path.join(target_dir, ASSET_MANIFEST_NAME),
+                      target_dir)
+    with profiler.stage("copy_content") if profiler else nullcontext():
+        manifest["static"] = sync_content(
+            source_dir, target_dir, previous_static, args.hash, args.link,
+            tree=static_tree, names=asset_names(manifest.get("assets")),
+            previous_names=previous_names, minify=args.minify,
+            minified=manifest.setdefault("minified", {}))
+    if not args.minify:
+        manifest.pop("minified")
+
+    images = None
+    if args.images:
+        scan_static_images(source_dir, static_tree, manifest)
+        cache_dir = (os.path.join(args.cache_dir, "images")
+                     if args.cache_dir else IMAGE_CACHE_DIR)
+        with profiler.stage("images") if profiler else nullcontext():
+            process_images(source_dir, manifest["images"], cache_dir)
+            manifest["image_variants"] = sync_variants(
+                manifest["images"], target_dir,
+                asset_names(manifest.get("assets")),
+                manifest.get("image_variants"), cache_dir)
+        # Images that could not be resized have lost their variants.
+        images = static_image_urls(manifest)
+    elif manifest.pop("images", None):
+        sync_variants({}, target_dir,
+                      previous_outputs=manifest.pop("image_variants", None))
+
+    graph = DependencyGraph(manifest.get("dependencies"))
+    for relative in sorted(set(previous_static) - set(manifest["static"])):
+        for source in graph.dependents("/" + relative):
+            print(f"Warning: {source} references removed {relative}")
+    save_manifest(MANIFEST_PATH, manifest)
+    return assets, images
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    basepath = args.basepath or "/"
+
+    if args.depends_on:
+        manifest = load_manifest(MANIFEST_PATH)
+        graph = DependencyGraph(manifest.get("dependencies"))
+        for source in graph.dependents_of_path(args.depends_on, "content",
+                                               "static", "template.html"):
+            print(source)
+        return
+
+    if args.serve:
+        serve("content", "static", "template.html", basepath, args.port,
+              args.inline_memo_size)
+        return
+
+    profiler = None
+    if args.profile:
+        profiler = Profiler()
+        profiler.install()
+        # Stages are timed on one stack, so pages render on this thread.
+        args.jobs = 1
+        args.pipeline = False
 
     source_dir = os.path.abspath("static")
     target_dir = os.path.abspath("docs")
+    manifest_path = MANIFEST_PATH
+    if args.shard:
+        target_dir = shard_root(args.shard_dir, *args.shard)
+        manifest_path = os.path.join(target_dir, MANIFEST_PATH)
 
-    if os.path.exists(target_dir):
+    if not args.incremental and os.path.exists(target_dir):
         rmtree(target_dir)
-    os.mkdir(target_dir)
+    os.makedirs(target_dir, exist_ok=True)
+
+    # Both trees are walked once; the page generator and the static sync
+    # work from these listings instead of stat-ing paths themselves.
+    with profiler.stage("scan") if profiler else nullcontext():
+        content_tree = scan_tree("content")
+        static_tree = (scan_tree(source_dir)
+                       if os.path.isdir(source_dir) and
+                       (args.fingerprint or args.images or not args.shard)
+                       else None)
+
+    if args.shard:
+        content_tree = shard_tree(content_tree, *args.shard)
+        # Shards link to the same fingerprinted names and image variants
+        # that --merge copies, but do not copy or resize anything.
+        assets = images = None
+        manifest = load_manifest(manifest_path)
+        if args.fingerprint:
+            assets = fingerprint_static(source_dir, static_tree, manifest,
+                                        args.minify)
+        if args.images:
+            scan_static_images(source_dir, static_tree, manifest)
+            images = static_image_urls(manifest)
+        save_manifest(manifest_path, manifest)
+    else:
+        assets, images = sync_static(source_dir, target_dir, static_tree,
+                                     args, profiler)
+
+    if args.merge:
+        merge_shards("content", "template.html", args.shard_dir,
+                     args.merge, target_dir, MANIFEST_PATH, content_tree,
+                     args.link, args.search_index, basepath, assets, images,
+                     args.minify)
+    else:
+        generate_pages_incremental(
+            "content", "template.html", target_dir, manifest_path, basepath,
+            args.jobs, args.cache_dir, args.cache_size * 1024 * 1024,
+            args.pipeline, args.inline_memo_size, content_tree,
+            args.search_index, assets, images, args.minify)
+
+    if profiler:
+        profiler.uninstall()
+        profiler.report(args.profile_top)
+        if args.profile_json:
+            profiler.dump(args.profile_json)
 
-    copy_content(source_dir, target_dir)
-    generate_page_recursive(
-        "content", "template.html", "docs", basepath)
+    if args.watch:
+        resync = None
+        if args.fingerprint or args.images or args.minify:
+            def resync():
+                return sync_static(source_dir, target_dir,
+                                   scan_tree(source_dir), args, None)
+        watch("content", "static", "template.html", target_dir, basepath,
+              args.port, assets, images, args.minify, resync,
+              args.inline_memo_size)
 
 
 if __name__ == "__main__":
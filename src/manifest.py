@@ -0,0 +1,42 @@
+import hashlib
+import json
+import os
+
+MANIFEST_VERSION = 2
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path):
+    with open(path, "rb") as f:
+        return hash_bytes(f.read())
+
+
+def new_manifest():
+    return {"version": MANIFEST_VERSION, "pages": {}}
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return new_manifest()
+
+    try:
+        with open(path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return new_manifest()
+
+    if (not isinstance(manifest, dict) or
+            manifest.get("version") != MANIFEST_VERSION):
+        return new_manifest()
+    return manifest
+
+
+def save_manifest(path, manifest):
+    abs_path = os.path.abspath(path)
+    tmp_path = abs_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, abs_path)
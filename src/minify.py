@@ -0,0 +1,83 @@
+import os
+import re
+
+from output import write_atomic
+
+# Elements whose contents are kept byte for byte.
+RAW_ELEMENT_PATTERN = re.compile(
+    r"(<(pre|textarea|script|style)\b.*?</\2\s*>)", re.S | re.I)
+COMMENT_PATTERN = re.compile(r"<!--(?!\[).*?-->", re.S)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+# Whitespace next to these tags never renders, so it is dropped; around
+# inline elements it is collapsed to one space instead.
+BLOCK_TAG_PATTERN = re.compile(
+    r" ?(<!doctype[^>]*>|</?(?:html|head|body|meta|link|title|base|"
+    r"article|aside|section|header|footer|nav|main|div|p|h[1-6]|ul|ol|li|"
+    r"blockquote|table|thead|tbody|tr|th|td|form|figure|figcaption|hr|br)"
+    r"\b[^>]*>) ?", re.I)
+SELF_CLOSING_PATTERN = re.compile(r"\s+/>")
+
+CSS_TOKEN_PATTERN = re.compile(
+    r"""(/\*.*?\*/)|("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')""", re.S)
+CSS_PUNCTUATION_PATTERN = re.compile(r" ?([{};,>]) ?")
+
+
+def minify_html(html):
+    parts = RAW_ELEMENT_PATTERN.split(html)
+    minified = []
+    # split() yields text, then each raw element and its tag name.
+    for i in range(0, len(parts), 3):
+        text = COMMENT_PATTERN.sub("", parts[i])
+        text = WHITESPACE_PATTERN.sub(" ", text)
+        text = BLOCK_TAG_PATTERN.sub(r"\1", text)
+        minified.append(SELF_CLOSING_PATTERN.sub(">", text))
+        if i + 1 < len(parts):
+            minified.append(parts[i + 1])
+    return "".join(minified).strip()
+
+
+def minify_css_code(code):
+    code = WHITESPACE_PATTERN.sub(" ", code)
+    code = CSS_PUNCTUATION_PATTERN.sub(r"\1", code)
+    return code.replace(": ", ":").replace(";}", "}")
+
+
+def minify_css(css):
+    # Strings are kept as they are; comments become whitespace so that
+    # they cannot join the tokens around them.
+    parts = []
+    code = []
+    position = 0
+    for match in CSS_TOKEN_PATTERN.finditer(css):
+        code.append(css[position:match.start()])
+        if match.group(1):
+            code.append(" ")
+        else:
+            parts.append(minify_css_code("".join(code)))
+            parts.append(match.group(2))
+            code = []
+        position = match.end()
+    code.append(css[position:])
+    parts.append(minify_css_code("".join(code)))
+    return "".join(parts).strip()
+
+
+def minify_css_file(source, target):
+    with open(source, "r") as f:
+        css = minify_css(f.read())
+    write_atomic(target, css.encode())
+    stat = os.stat(target)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def is_minified(target, record, size, mtime_ns):
+    # record is [source size, source mtime_ns, target size, target
+    # mtime_ns] from when target was last minified; both files must still
+    # match it.
+    if record is None or record[:2] != [size, mtime_ns]:
+        return False
+    try:
+        stat = os.stat(target)
+    except FileNotFoundError:
+        return False
+    return record[2:] == [stat.st_size, stat.st_mtime_ns]
@@ -0,0 +1,64 @@
+import os
+
+from manifest import hash_bytes, hash_file
+
+
+def output_unchanged(dest_path, data):
+    try:
+        if os.path.getsize(dest_path) != len(data):
+            return False
+        return hash_file(dest_path) == hash_bytes(data)
+    except FileNotFoundError:
+        return False
+
+
+def replace_if_changed(tmp_path, dest_path):
+    # Identical outputs keep their mtime so that deploys (rsync, CDN sync)
+    # only upload pages whose HTML actually changed.
+    try:
+        if (os.path.getsize(tmp_path) == os.path.getsize(dest_path) and
+                hash_file(tmp_path) == hash_file(dest_path)):
+            os.remove(tmp_path)
+            return False
+    except FileNotFoundError:
+        pass
+    os.replace(tmp_path, dest_path)
+    return True
+
+
+def write_atomic(path, data):
+    # Readers, including other build processes, see either the old file
+    # or the complete new one.
+    dest_dir_path = os.path.dirname(path)
+    if dest_dir_path != "":
+        os.makedirs(dest_dir_path, exist_ok=True)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+
+
+def write_output(dest_path, html):
+    data = html.encode()
+    if output_unchanged(dest_path, data):
+        return False
+    write_atomic(dest_path, data)
+    return True
+
+
+def remove_output(path, dest_dir_path):
+    abs_dest_dir_path = os.path.abspath(dest_dir_path)
+    if os.path.exists(path):
+        os.remove(path)
+
+    parent = os.path.dirname(path)
+    while parent != abs_dest_dir_path and parent.startswith(abs_dest_dir_path):
+        if os.listdir(parent):
+            break
+        os.rmdir(parent)
+        parent = os.path.dirname(parent)
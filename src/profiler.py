@@ -0,0 +1,136 @@
+import functools
+import json
+import time
+
+import block_markdown
+import generate_page
+import htmlnode
+import template
+
+# (stage, owner, attribute): every place a pipeline function is looked up
+# at call time. Modules that import a function by name hold their own
+# reference, so each of those references is patched.
+STAGES = [
+    ("read", generate_page, "read_markdown"),
+    ("markdown_to_blocks", htmlnode, "markdown_to_blocks"),
+    ("classify_block", htmlnode, "classify_block"),
+    ("classify_block", block_markdown, "classify_block"),
+    ("text_to_textnodes", htmlnode, "text_to_textnodes"),
+    ("extract_title", generate_page, "extract_title"),
+    ("to_html", htmlnode.ParentNode, "write_html"),
+    ("to_html", htmlnode.LeafNode, "write_html"),
+    ("template", template.Template, "render_to"),
+    ("write", generate_page, "write_page"),
+]
+
+
+class Profiler:
+    def __init__(self):
+        self.stages = {}
+        self.pages = []
+        self.stack = []
+        self.originals = []
+        self.start = time.perf_counter()
+
+    def install(self):
+        for stage, owner, attribute in STAGES:
+            original = getattr(owner, attribute)
+            self.originals.append((owner, attribute, original))
+            setattr(owner, attribute, self.wrap(stage, original))
+
+        original = generate_page.generate_page
+        self.originals.append((generate_page, "generate_page", original))
+
+        @functools.wraps(original)
+        def timed_page(from_path, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(from_path, *args, **kwargs)
+            finally:
+                self.pages.append((time.perf_counter() - start, from_path))
+
+        generate_page.generate_page = timed_page
+
+    def uninstall(self):
+        for owner, attribute, original in reversed(self.originals):
+            setattr(owner, attribute, original)
+        self.originals = []
+
+    def wrap(self, stage, function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with self.stage(stage):
+                return function(*args, **kwargs)
+        return wrapper
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def record(self, name, total, own):
+        calls, total_sum, own_sum = self.stages.get(name, (0, 0.0, 0.0))
+        self.stages[name] = (calls + 1, total_sum + total, own_sum + own)
+
+    def trace(self):
+        return {
+            "wall_seconds": time.perf_counter() - self.start,
+            "stages": {
+                name: {"calls": calls, "total_seconds": total,
+                       "self_seconds": own}
+                for name, (calls, total, own) in self.stages.items()
+            },
+            "pages": [
+                {"path": path, "seconds": seconds}
+                for seconds, path in sorted(self.pages, reverse=True)
+            ],
+        }
+
+    def report(self, top=10):
+        trace = self.trace()
+        wall = max(trace["wall_seconds"], 1e-9)
+        print(f"Profile: {len(self.pages)} pages in {wall:.3f}s")
+        print(f"{'stage':>20} {'calls':>9} {'total (s)':>10} "
+              f"{'self (s)':>10} {'self %':>7}")
+        stages = sorted(trace["stages"].items(),
+                        key=lambda item: item[1]["self_seconds"],
+                        reverse=True)
+        for name, stage in stages:
+            print(f"{name:>20} {stage['calls']:>9} "
+                  f"{stage['total_seconds']:>10.4f} "
+                  f"{stage['self_seconds']:>10.4f} "
+                  f"{stage['self_seconds'] / wall:>7.1%}")
+
+        print(f"Slowest {min(top, len(self.pages))} pages:")
+        for page in trace["pages"][:top]:
+            print(f"{page['seconds']:>10.4f}s  {page['path']}")
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump(self.trace(), f, indent=2)
+
+
+class _Stage:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.nested = False
+
+    def __enter__(self):
+        stack = self.profiler.stack
+        # Recursive calls (nested write_html) are counted but only timed by
+        # the outermost call, so their time is not added up several times.
+        if stack and stack[-1][0] == self.name:
+            self.nested = True
+            self.profiler.record(self.name, 0.0, 0.0)
+            return self
+        stack.append([self.name, time.perf_counter(), 0.0])
+        return self
+
+    def __exit__(self, *exc):
+        if self.nested:
+            return False
+        name, start, children = self.profiler.stack.pop()
+        total = time.perf_counter() - start
+        if self.profiler.stack:
+            self.profiler.stack[-1][2] += total
+        self.profiler.record(name, total, total - children)
+        return False
@@ -0,0 +1,31 @@
+import os
+
+FILE = "file"
+DIRECTORY = "directory"
+
+
+def scan_tree(root):
+    # {relative path: (size, mtime_ns, kind)} for everything under root,
+    # from a single os.scandir pass. DirEntry caches the entry type from
+    # the directory listing, so only files cost a stat call; directories
+    # are recorded with size and mtime None.
+    tree = {}
+    pending = [""]
+    while pending:
+        relative = pending.pop()
+        with os.scandir(os.path.join(root, relative)) as entries:
+            for entry in entries:
+                path = os.path.join(relative, entry.name)
+                if entry.is_dir():
+                    tree[path] = (None, None, DIRECTORY)
+                    pending.append(path)
+                elif entry.is_file():
+                    stat = entry.stat()
+                    tree[path] = (stat.st_size, stat.st_mtime_ns, FILE)
+    return tree
+
+
+def tree_files(tree):
+    return {relative: (size, mtime_ns)
+            for relative, (size, mtime_ns, kind) in tree.items()
+            if kind == FILE}
@@ -0,0 +1,180 @@
+import json
+import os
+import re
+
+from output import write_atomic, write_output
+
+STATE_NAME = ".search-index.json"
+INDEX_DIR = "search"
+# Terms are sharded by their first characters, so a client looks up a
+# query term by fetching search/terms/<prefix>.json only.
+PREFIX_LENGTH = 2
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 32
+
+TOKEN_PATTERN = re.compile(r"<(/?)([a-zA-Z0-9]+)[^>]*>|([^<]+)")
+WORD_PATTERN = re.compile(r"\w+")
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+
+
+class PageText:
+    def __init__(self):
+        self.title = None
+        self.headings = []
+        self.heading = None
+        self.words = 0
+        self.terms = set()
+
+    def feed(self, html):
+        # Chunks written by HTMLNode.write_html never split a tag, so the
+        # page can be indexed chunk by chunk while it is written.
+        for match in TOKEN_PATTERN.finditer(html):
+            closing, tag, text = match.groups()
+            if text is not None:
+                self.add_text(text)
+            elif tag in HEADING_TAGS:
+                if not closing:
+                    self.heading = []
+                elif self.heading is not None:
+                    self.headings.append("".join(self.heading).strip())
+                    self.heading = None
+
+    def add_text(self, text):
+        if self.heading is not None:
+            self.heading.append(text)
+        words = WORD_PATTERN.findall(text.lower())
+        self.words += len(words)
+        self.terms.update(word for word in words
+                          if MIN_TERM_LENGTH <= len(word) <= MAX_TERM_LENGTH)
+
+    def entry(self):
+        return {
+            "title": self.title.strip(),
+            "headings": self.headings,
+            "words": self.words,
+            "terms": sorted(self.terms),
+        }
+
+
+class IndexedNode:
+    # Stands in for a page's content node and feeds its HTML to a PageText
+    # on the way to the writer.
+    __slots__ = ("node", "text")
+
+    def __init__(self, node, text):
+        self.node = node
+        self.text = text
+
+    def write_html(self, write):
+        feed = self.text.feed
+
+        def tee(chunk):
+            feed(chunk)
+            write(chunk)
+
+        self.node.write_html(tee)
+
+
+def page_url(output):
+    url = "/" + output.replace(os.sep, "/")
+    if url.endswith("/index.html"):
+        url = url[:-len("index.html")]
+    return url
+
+
+def state_path(manifest_path):
+    return os.path.join(os.path.dirname(os.path.abspath(manifest_path)),
+                        STATE_NAME)
+
+
+def load_state(path):
+    try:
+        with open(path, "r") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = None
+    if not isinstance(state, dict) or "pages" not in state:
+        state = {"pages": {}, "ids": {}}
+    return state
+
+
+def save_state(path, state):
+    write_atomic(path, json.dumps(state, sort_keys=True,
+                                  separators=(",", ":")).encode())
+
+
+def update_state(state, entries, sources):
+    pages = {source: entry for source, entry in state["pages"].items()
+             if source in sources}
+    pages.update(entries)
+    # Ids stay with their page across builds so that the term files of
+    # unchanged prefixes stay byte-identical.
+    ids = {source: page_id for source, page_id in state["ids"].items()
+           if source in pages}
+    next_id = max(ids.values(), default=-1) + 1
+    for source in sorted(pages.keys() - ids.keys()):
+        ids[source] = next_id
+        next_id += 1
+    state["pages"] = pages
+    state["ids"] = ids
+
+
+def write_index(state, dest_dir_path, links):
+    index_dir = os.path.join(os.path.abspath(dest_dir_path), INDEX_DIR)
+    terms_dir = os.path.join(index_dir, "terms")
+    sitemap = []
+    shards = {}
+    for source, entry in state["pages"].items():
+        page_id = state["ids"][source]
+        sitemap.append({
+            "id": page_id,
+            "path": links.rewrite(entry["path"]),
+            "title": entry["title"],
+            "headings": entry["headings"],
+            "words": entry["words"],
+        })
+        for term in entry["terms"]:
+            shards.setdefault(term[:PREFIX_LENGTH], {}).setdefault(
+                term, []).append(page_id)
+    sitemap.sort(key=lambda page: page["path"])
+
+    changed = write_output(os.path.join(index_dir, "sitemap.json"),
+                           json.dumps({"prefix_length": PREFIX_LENGTH,
+                                       "pages": sitemap},
+                                      separators=(",", ":")))
+    for prefix, terms in shards.items():
+        for ids in terms.values():
+            ids.sort()
+        changed += write_output(
+            os.path.join(terms_dir, prefix + ".json"),
+            json.dumps(terms, sort_keys=True, separators=(",", ":")))
+
+    removed = 0
+    if os.path.isdir(terms_dir):
+        for filename in os.listdir(terms_dir):
+            if filename[:-len(".json")] not in shards:
+                os.remove(os.path.join(terms_dir, filename))
+                removed += 1
+    print(f"Search index: {len(sitemap)} pages, {len(shards)} term files "
+          f"({changed} written, {removed} removed)")
+
+
+def remove_index(state_path, dest_dir_path):
+    # Removes the index and its state once a build runs without
+    # --search-index; the state file tells that an index was written.
+    if not os.path.exists(state_path):
+        return
+    index_dir = os.path.join(os.path.abspath(dest_dir_path), INDEX_DIR)
+    terms_dir = os.path.join(index_dir, "terms")
+    paths = [os.path.join(index_dir, "sitemap.json")]
+    if os.path.isdir(terms_dir):
+        paths += [os.path.join(terms_dir, filename)
+                  for filename in os.listdir(terms_dir)]
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+    for directory in (terms_dir, index_dir):
+        if os.path.isdir(directory) and not os.listdir(directory):
+            os.rmdir(directory)
+    os.remove(state_path)
+    print("Search index: removed")
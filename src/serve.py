@@ -0,0 +1,211 @@
+import os
+import posixpath
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+from generate_page import render_page
+from htmlnode import INLINE_MEMO
+from inline_memo import DEFAULT_MAX_ENTRIES
+from template import load_template
+
+
+class LazySite:
+    def __init__(self,
+                 dir_path_content,
+                 dir_path_static,
+                 template_path,
+                 basepath="/"):
+        self.content_dir = os.path.abspath(dir_path_content)
+        self.static_dir = os.path.abspath(dir_path_static)
+        self.template_path = os.path.abspath(template_path)
+        self.basepath = basepath
+
+        self.template = None
+        self.template_stat = None
+        # source path -> (source stat, template stat, rendered page)
+        self.pages = {}
+        # Rendering is CPU bound and the inline memo is shared, so pages
+        # render one at a time; cached pages and static files are served
+        # concurrently.
+        self.render_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.renders = 0
+        self.hits = 0
+        self.render_seconds = 0.0
+        self.max_render_seconds = 0.0
+
+    def site_path(self, url):
+        path = unquote(urlsplit(url).path)
+        if self.basepath == "/":
+            return path
+        prefix = self.basepath.rstrip("/")
+        if path == prefix:
+            return "/"
+        if path.startswith(prefix + "/"):
+            return path[len(prefix):]
+        return None
+
+    def find_source(self, path):
+        # Returns (source, redirect): the markdown file that generates the
+        # page at path, or the URL to redirect a directory path to.
+        directory = path.endswith("/")
+        relative = posixpath.normpath("/" + path).lstrip("/")
+        if directory or relative == "":
+            candidate = posixpath.join(relative, "index.md")
+        elif relative.endswith(".html"):
+            candidate = relative[:-len(".html")] + ".md"
+        else:
+            index = os.path.join(self.content_dir, relative, "index.md")
+            if os.path.isfile(index):
+                return None, f"{self.basepath.rstrip('/')}/{relative}/"
+            return None, None
+
+        source = os.path.join(self.content_dir, *candidate.split("/"))
+        if os.path.isfile(source):
+            return source, None
+        return None, None
+
+    def current_template(self):
+        stat = os.stat(self.template_path)
+        template_stat = (stat.st_size, stat.st_mtime_ns)
+        if template_stat != self.template_stat:
+            with self.render_lock:
+                if template_stat != self.template_stat:
+                    self.template = load_template(self.template_path,
+                                                  self.basepath)
+                    self.template_stat = template_stat
+        return template_stat
+
+    def render(self, source):
+        # Returns (page, cached). A page is rendered again once its source
+        # or the template has a different size or mtime.
+        template_stat = self.current_template()
+        stat = os.stat(source)
+        source_stat = (stat.st_size, stat.st_mtime_ns)
+        entry = self.pages.get(source)
+        if entry is None or entry[:2] != (source_stat, template_stat):
+            with self.render_lock:
+                # Another request may have rendered it while this one
+                # waited for the lock.
+                entry = self.pages.get(source)
+                if entry is None or entry[:2] != (source_stat,
+                                                  template_stat):
+                    return self.render_locked(source, source_stat,
+                                              template_stat)
+        with self.stats_lock:
+            self.hits += 1
+        return entry[2], True
+
+    def render_locked(self, source, source_stat, template_stat):
+        start = time.perf_counter()
+        with open(source, "r") as f:
+            page = render_page(f.read(), self.template).encode()
+        elapsed = time.perf_counter() - start
+        self.pages[source] = (source_stat, template_stat, page)
+
+        with self.stats_lock:
+            self.renders += 1
+            self.render_seconds += elapsed
+            self.max_render_seconds = max(self.max_render_seconds, elapsed)
+        return page, False
+
+    def stats(self):
+        mean = self.render_seconds / self.renders if self.renders else 0
+        return (f"{self.renders} renders (mean {mean * 1000:.1f}ms, max "
+                f"{self.max_render_seconds * 1000:.1f}ms), "
+                f"{self.hits} cache hits")
+
+
+class LazyHandler(SimpleHTTPRequestHandler):
+    def __init__(self, request, client_address, server):
+        self.site = server.site
+        super().__init__(request, client_address, server,
+                         directory=self.site.static_dir)
+
+    def do_GET(self):
+        self.serve(send_body=True)
+
+    def do_HEAD(self):
+        self.serve(send_body=False)
+
+    def serve(self, send_body):
+        start = time.perf_counter()
+        url = self.path
+        path = self.site.site_path(url)
+        source = redirect = None
+        if path is not None:
+            source, redirect = self.site.find_source(path)
+
+        if path is None:
+            self.send_error(404, "Outside of the site's basepath")
+            outcome = "not found"
+        elif redirect:
+            self.send_response(301)
+            self.send_header("Location", redirect)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            outcome = f"redirect to {redirect}"
+        elif source:
+            outcome = self.serve_page(source, send_body)
+        else:
+            self.path = path
+            if send_body:
+                super().do_GET()
+            else:
+                super().do_HEAD()
+            outcome = "static"
+
+        print(f"{self.command} {url} {outcome} in "
+              f"{(time.perf_counter() - start) * 1000:.1f}ms")
+
+    def serve_page(self, source, send_body):
+        try:
+            page, cached = self.site.render(source)
+        except Exception as e:
+            self.send_error(500, f"Could not render {source}: {e}")
+            return f"error: {e}"
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(page)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(page)
+        return "cached" if cached else "rendered"
+
+    def log_message(self, format, *args):
+        # serve() prints one line per request, including its latency.
+        pass
+
+
+def start_lazy_server(site, port):
+    server = ThreadingHTTPServer(("", port), LazyHandler)
+    server.site = site
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def serve(dir_path_content,
+          dir_path_static,
+          template_path,
+          basepath="/",
+          port=8888,
+          memo_size=DEFAULT_MAX_ENTRIES):
+    INLINE_MEMO.resize(memo_size)
+    site = LazySite(dir_path_content, dir_path_static, template_path,
+                    basepath)
+    server = start_lazy_server(site, port)
+    print(f"Rendering {site.content_dir} on demand at "
+          f"http://localhost:{server.server_address[1]}{basepath}")
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+        print(f"Served pages: {site.stats()}")
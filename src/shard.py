@@ -0,0 +1,160 @@
+import argparse
+import hashlib
+import os
+import time
+
+from copy_content import copy_files
+from depgraph import DependencyGraph
+from generate_page import find_pages, make_template_entry, remove_pages
+from manifest import hash_file, load_manifest, save_manifest
+from scan import FILE, scan_tree
+from search_index import (STATE_NAME, load_state, remove_index, save_state,
+                          state_path, update_state, write_index)
+from template import LinkRewriter
+
+
+def parse_shard(text):
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got {text!r}")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(
+            f"shard {index}/{count} is out of range (1 <= i <= N)")
+    return index, count
+
+
+def shard_of(source, count):
+    # Hash the platform independent path so that every machine assigns a
+    # page to the same shard.
+    digest = hashlib.sha256(source.replace(os.sep, "/").encode()).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+def shard_root(shard_dir, index, count):
+    return os.path.join(os.path.abspath(shard_dir), f"{index}-of-{count}")
+
+
+def shard_tree(tree, index, count):
+    return {relative: entry for relative, entry in tree.items()
+            if entry[2] != FILE or shard_of(relative, count) == index}
+
+
+def merge_shards(dir_path_content,
+                 template_path,
+                 shard_dir,
+                 count,
+                 dest_dir_path,
+                 manifest_path,
+                 tree=None,
+                 link=False,
+                 search=False,
+                 basepath="/",
+                 assets=None,
+                 images=None,
+                 minify=False):
+    abs_dir_path_content = os.path.abspath(dir_path_content)
+    abs_dest_dir_path = os.path.abspath(dest_dir_path)
+    manifest_name = os.path.basename(manifest_path)
+    shard_manifests = {
+        index: load_manifest(os.path.join(shard_root(shard_dir, index, count),
+                                          manifest_name))
+        for index in range(1, count + 1)
+    }
+    if tree is None:
+        tree = scan_tree(abs_dir_path_content)
+
+    search_states = {}
+    if search:
+        search_states = {
+            index: load_state(os.path.join(
+                shard_root(shard_dir, index, count), STATE_NAME))
+            for index in range(1, count + 1)
+        }
+
+    # Every page of the current content tree must come from the shard it
+    # hashes to, rendered from the same source.
+    pairs = []
+    problems = []
+    entries = {}
+    new_pages = {}
+    references = {}
+    scan_ns = time.time_ns()
+    # Pages must be rendered from this template and link to the static
+    # files this build copies.
+    template_entry = make_template_entry(os.path.abspath(template_path),
+                                         basepath, minify)
+    for index, manifest in shard_manifests.items():
+        if not manifest["pages"]:
+            continue
+        if manifest.get("template") != template_entry:
+            problems.append(f"shard {index}/{count} was rendered with a "
+                            f"different template, basepath or --minify")
+        if ((manifest.get("asset_urls") or {}) != (assets or {}) or
+                (manifest.get("image_urls") or {}) != (images or {})):
+            problems.append(f"shard {index}/{count} links to different "
+                            f"static files")
+    for from_path, dest_path in find_pages(abs_dir_path_content,
+                                           abs_dest_dir_path, tree):
+        source = os.path.relpath(from_path, abs_dir_path_content)
+        output = os.path.relpath(dest_path, abs_dest_dir_path)
+        index = shard_of(source, count)
+        shard_output = os.path.join(shard_root(shard_dir, index, count),
+                                    output)
+        entry = shard_manifests[index]["pages"].get(source)
+        if (entry is None or entry["output"] != output or
+                not os.path.exists(shard_output)):
+            problems.append(f"{source} is missing from shard {index}/{count}")
+        elif entry["content_hash"] != hash_file(from_path):
+            problems.append(f"{source} is out of date in shard "
+                            f"{index}/{count}")
+        else:
+            pairs.append((shard_output, dest_path))
+            size, mtime_ns, _ = tree[source]
+            new_pages[source] = {
+                "content_hash": entry["content_hash"],
+                "output": output,
+                "size": size,
+                "mtime_ns": mtime_ns,
+            }
+            references[source] = shard_manifests[index].get(
+                "dependencies", {}).get(source, [])
+            if search:
+                entries[source] = search_states[index]["pages"].get(source)
+                if entries[source] is None:
+                    problems.append(f"{source} is missing from the search "
+                                    f"index of shard {index}/{count}")
+
+    if problems:
+        raise Exception(f"Error: cannot merge {len(problems)} pages:\n  " +
+                        "\n  ".join(problems))
+    elapsed = copy_files(pairs, link)
+    print(f"Merged {len(pairs)} pages from {count} shards in {elapsed:.3f}s")
+
+    # The merged pages are recorded like a build of their own, so a later
+    # merge or incremental build removes pages whose sources are gone.
+    manifest = load_manifest(manifest_path)
+    graph = DependencyGraph(manifest.get("dependencies"))
+    removed = remove_pages(manifest["pages"], new_pages, abs_dest_dir_path,
+                           graph)
+    for source in sorted(references):
+        graph.set_page(source, references[source])
+
+    if search:
+        search_state_path = state_path(manifest_path)
+        search_state = load_state(search_state_path)
+        update_state(search_state, entries, entries.keys())
+        write_index(search_state, abs_dest_dir_path, LinkRewriter(basepath))
+        save_state(search_state_path, search_state)
+    else:
+        remove_index(state_path(manifest_path), abs_dest_dir_path)
+
+    manifest["pages"] = new_pages
+    manifest["scan_ns"] = scan_ns
+    manifest["template"] = template_entry
+    manifest["asset_urls"] = assets or {}
+    manifest["image_urls"] = images or {}
+    manifest["dependencies"] = graph.to_json()
+    save_manifest(manifest_path, manifest)
+    if removed:
+        print(f"Removed {removed} pages whose sources were deleted")
@@ -0,0 +1,109 @@
+import json
+import re
+
+from manifest import hash_bytes
+from minify import minify_html
+
+SLOT_PATTERN = re.compile(r"\{\{ (Title|Content) \}\}")
+URL_ATTRIBUTE_PATTERN = re.compile(r'(href|src)="(/[^"]*)"')
+URL_PATH_PATTERN = re.compile(r"[^?#]*")
+
+
+class LinkRewriter:
+    def __init__(self, basepath="/", assets=None, images=None, minify=False):
+        self.basepath = basepath
+        self.minify = minify
+        # Site URL of a static file -> its fingerprinted URL.
+        self.assets = assets or {}
+        # Site URL of an image -> [width, height, [[variant URL, width]]]
+        self.images = images or {}
+        self.key = basepath
+        if self.assets or self.images:
+            digest = hash_bytes(json.dumps([self.assets, self.images],
+                                           sort_keys=True).encode())
+            self.key = f"{basepath} {digest}"
+        if minify:
+            self.key = f"{self.key} minify"
+        # Set to a set while a page renders; collects the root-relative
+        # URLs its links and images point to.
+        self.references = None
+
+    def cache_key(self):
+        return self.key
+
+    def record(self, urls):
+        if self.references is not None:
+            self.references.update(urls)
+
+    def rewrite(self, url):
+        if url is None or not url.startswith("/"):
+            return url
+        if self.assets:
+            url = self.fingerprint(url)
+        if self.basepath == "/":
+            return url
+        return self.basepath + url[1:]
+
+    def fingerprint(self, url):
+        path = URL_PATH_PATTERN.match(url).group(0)
+        fingerprinted = self.assets.get(path)
+        if fingerprinted is None:
+            return url
+        return fingerprinted + url[len(path):]
+
+    def image_attributes(self, url):
+        image = self.images.get(URL_PATH_PATTERN.match(url).group(0))
+        if image is None:
+            return {}
+        width, height, variants = image
+        attributes = {"width": str(width), "height": str(height)}
+        if variants:
+            candidates = [f"{self.rewrite(variant)} {variant_width}w"
+                          for variant, variant_width in variants]
+            candidates.append(f"{self.rewrite(url)} {width}w")
+            attributes["srcset"] = ", ".join(candidates)
+            attributes["sizes"] = f"(max-width: {width}px) 100vw, {width}px"
+        return attributes
+
+    def rewrite_html(self, html):
+        return URL_ATTRIBUTE_PATTERN.sub(
+            lambda match: f'{match.group(1)}="{self.rewrite(match.group(2))}"',
+            html)
+
+
+class Template:
+    def __init__(self, text, links=None):
+        self.links = links or LinkRewriter()
+        text = self.links.rewrite_html(text)
+        if self.links.minify:
+            text = minify_html(text)
+
+        # literals[i] is followed by slots[i]; the last literal closes the
+        # document.
+        self.literals = []
+        self.slots = []
+        position = 0
+        for match in SLOT_PATTERN.finditer(text):
+            self.literals.append(text[position:match.start()])
+            self.slots.append(match.group(1))
+            position = match.end()
+        self.literals.append(text[position:])
+
+    def render_to(self, write, title, content_node):
+        for literal, slot in zip(self.literals, self.slots):
+            write(literal)
+            if slot == "Title":
+                write(title)
+            else:
+                content_node.write_html(write)
+        write(self.literals[-1])
+
+
+def load_template(template_path,
+                  basepath="/",
+                  assets=None,
+                  images=None,
+                  minify=False):
+    with open(template_path, "r") as f:
+        return Template(f.read(),
+                        LinkRewriter(basepath, assets, images, minify))
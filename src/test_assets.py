@@ -0,0 +1,137 @@
+import json
+import os
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest.mock import patch
+
+from assets import (ASSET_MANIFEST_NAME, asset_urls, fingerprint_files,
+                    fingerprint_name)
+from benchmark import generate_corpus, run_build
+from copy_content import scan_static
+from fixtures import read_file, temp_dir, write_file
+from generate_page import generate_pages_incremental
+from manifest import hash_bytes, hash_file
+
+TEMPLATE = '<link href="/index.css"><title>{{ Title }}</title>{{ Content }}'
+
+
+class TestFingerprint(unittest.TestCase):
+    def setUp(self):
+        self.source = temp_dir(self)
+        write_file(os.path.join(self.source, "index.css"), "body {}", 1000)
+        write_file(os.path.join(self.source, "images", "a.png"), "png", 1000)
+
+    def fingerprint(self, previous=None, minify=False):
+        with redirect_stdout(StringIO()):
+            return fingerprint_files(self.source, scan_static(self.source),
+                                     previous, minify)
+
+    def test_fingerprint_name(self):
+        digest = hash_bytes(b"png")
+        self.assertEqual(fingerprint_name(os.path.join("images", "a.png"),
+                                          digest),
+                         os.path.join("images", f"a.{digest[:12]}.png"))
+        self.assertEqual(fingerprint_name("LICENSE", digest),
+                         f"LICENSE.{digest[:12]}")
+
+    def test_asset_urls(self):
+        fingerprints = self.fingerprint()
+        digest = hash_bytes(b"png")[:12]
+        self.assertEqual(asset_urls(fingerprints)["/images/a.png"],
+                         f"/images/a.{digest}.png")
+
+    def test_only_changed_files_are_hashed(self):
+        fingerprints = self.fingerprint()
+        write_file(os.path.join(self.source, "index.css"), "body { }", 2000)
+        with patch("assets.hash_file", wraps=hash_file) as hashed:
+            self.assertNotEqual(self.fingerprint(fingerprints),
+                                fingerprints)
+        hashed.assert_called_once_with(os.path.join(self.source,
+                                                    "index.css"))
+
+    def test_minified_stylesheet_gets_its_own_name(self):
+        plain = self.fingerprint()
+        minified = self.fingerprint(plain, minify=True)
+        self.assertEqual(asset_urls(minified)["/index.css"],
+                         f"/index.{hash_bytes(b'body{}')[:12]}.css")
+        self.assertNotEqual(minified["index.css"], plain["index.css"])
+        self.assertEqual(minified["images/a.png"], plain["images/a.png"])
+        with patch("assets.hash_file", wraps=hash_file) as hashed:
+            self.assertEqual(self.fingerprint(minified, minify=True),
+                             minified)
+        hashed.assert_not_called()
+        self.assertEqual(self.fingerprint(minified), plain)
+
+
+class TestFingerprintedSite(unittest.TestCase):
+    def setUp(self):
+        self.root = temp_dir(self)
+        generate_corpus(self.root, 2)
+
+    def stylesheet(self):
+        with open(os.path.join(self.root, "docs",
+                               ASSET_MANIFEST_NAME)) as f:
+            url = json.load(f)["/index.css"]
+        return url, read_file(os.path.join(self.root, "docs", url[1:]))
+
+    def test_toggling_minify_changes_stylesheet_url(self):
+        run_build(self.root, ["--fingerprint"])
+        plain_url, plain = self.stylesheet()
+        run_build(self.root, ["--fingerprint", "--minify", "--incremental"])
+        minified_url, minified = self.stylesheet()
+        self.assertNotEqual(minified_url, plain_url)
+        self.assertNotEqual(minified, plain)
+        self.assertFalse(os.path.exists(os.path.join(self.root, "docs",
+                                                     plain_url[1:])))
+        run_build(self.root, ["--fingerprint", "--incremental"])
+        self.assertEqual(self.stylesheet(), (plain_url, plain))
+
+
+class TestFingerprintedBuild(unittest.TestCase):
+    def setUp(self):
+        root = temp_dir(self)
+        self.content = os.path.join(root, "content")
+        self.dest = os.path.join(root, "docs")
+        self.template = os.path.join(root, "template.html")
+        self.manifest = os.path.join(root, "manifest.json")
+        write_file(self.template, TEMPLATE)
+        write_file(os.path.join(self.content, "index.md"), "# Home")
+        write_file(os.path.join(self.content, "post", "index.md"),
+                   "# Post\n\n![a](/images/a.png)")
+        self.assets = {"/index.css": "/index.1.css",
+                       "/images/a.png": "/images/a.1.png"}
+
+    def build(self):
+        output = StringIO()
+        with redirect_stdout(output):
+            generate_pages_incremental(self.content, self.template,
+                                       self.dest, self.manifest,
+                                       assets=self.assets)
+        return output.getvalue()
+
+    def test_pages_and_template_link_fingerprinted_names(self):
+        self.build()
+        self.assertIn('href="/index.1.css"',
+                      read_file(os.path.join(self.dest, "index.html")))
+        self.assertIn('src="/images/a.1.png"',
+                      read_file(os.path.join(self.dest, "post",
+                                             "index.html")))
+
+    def test_changed_asset_rebuilds_pages_that_reference_it(self):
+        self.build()
+        self.assets["/images/a.png"] = "/images/a.2.png"
+        self.assertIn("Generated 1 pages", self.build())
+        self.assertIn('src="/images/a.2.png"',
+                      read_file(os.path.join(self.dest, "post",
+                                             "index.html")))
+
+    def test_changed_template_asset_rebuilds_every_page(self):
+        self.build()
+        self.assets["/index.css"] = "/index.2.css"
+        self.assertIn("Generated 2 pages", self.build())
+        self.assertIn("Generated 0 pages", self.build())
+
+
+if __name__ == "__main__":
+    unittest.main()
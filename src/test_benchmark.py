@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+
+from benchmark import find_regressions, generate_corpus, run_build
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_corpus_builds(self):
+        with tempfile.TemporaryDirectory() as root:
+            generate_corpus(root, 20)
+            run_build(root, [])
+            outputs = [filename
+                       for _, _, filenames in os.walk(
+                           os.path.join(root, "docs"))
+                       for filename in filenames
+                       if filename.endswith(".html")]
+            self.assertEqual(len(outputs), 20)
+
+    def test_corpus_is_deterministic(self):
+        contents = []
+        for _ in range(2):
+            with tempfile.TemporaryDirectory() as root:
+                generate_corpus(root, 3, seed=7)
+                path = os.path.join(root, "content", "section-2", "page-2",
+                                    "index.md")
+                with open(path) as f:
+                    contents.append(f.read())
+        self.assertEqual(contents[0], contents[1])
+
+    def test_find_regressions(self):
+        baseline = {"100": {"total_seconds": 1.0,
+                            "stages": {"to_html": 0.5, "read": 0.001}}}
+        results = {"100": {"total_seconds": 1.1,
+                           "stages": {"to_html": 0.7, "read": 0.01}}}
+        regressions = find_regressions(results, baseline, 0.2)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("stage to_html", regressions[0])
+        self.assertEqual(find_regressions(results, {}, 0.2), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,9 @@
+import io
 import textwrap
 import unittest
 
-from block_markdown import (BlockType, block_to_block_type, extract_title,
+from block_markdown import (BlockType, block_to_block_type, classify_block,
+                            extract_title, find_title, iter_blocks,
                             markdown_to_blocks)
 
 
@@ -80,6 +82,13 @@ class TestBlockMarkdown(unittest.TestCase):
         block_type = block_to_block_type(md)
         self.assertEqual(block_type, BlockType.UNORDERED_LIST)
 
+    def test_classify_block_returns_lines(self):
+        block = "- one\n- two"
+        self.assertEqual(classify_block(block),
+                         (BlockType.UNORDERED_LIST, ["- one", "- two"]))
+        self.assertEqual(classify_block("> quote\nnot quoted")[0],
+                         BlockType.PARAGRAPH)
+
     def test_extract_title(self):
         md = textwrap.dedent("""
         # This is a single line header
@@ -110,5 +119,34 @@ class TestBlockMarkdown(unittest.TestCase):
                          "No level 1 header present in the text")
 
 
+class TestIterBlocks(unittest.TestCase):
+    def test_matches_markdown_to_blocks(self):
+        for md in [
+            "",
+            "\n\n\n",
+            "# Title\n\nSome text\nmore text\n\n- a\n- b\n",
+            "a\n\n\nb\nc\n\n\n\n\nd",
+            "  lead\n   \nsame block\n\n> quote\n>\n> more",
+            "```\ncode\n\nsplit\n```",
+        ]:
+            blocks = list(iter_blocks(io.StringIO(md)))
+            self.assertEqual([block for block, _, _ in blocks],
+                             markdown_to_blocks(md), md)
+            self.assertEqual([block_type for _, block_type, _ in blocks],
+                             [block_to_block_type(block)
+                              for block in markdown_to_blocks(md)])
+
+    def test_is_lazy(self):
+        lines = iter(["# Title\n", "\n", "text\n", "\n"])
+        blocks = iter_blocks(lines)
+        self.assertEqual(next(blocks),
+                         ("# Title", BlockType.HEADING, ["# Title"]))
+        self.assertEqual(next(lines), "text\n")
+
+    def test_find_title_from_file_lines(self):
+        lines = io.StringIO("intro\n# The title\nbody\n")
+        self.assertEqual(find_title(lines), " The title")
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,136 @@
+import os
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from copy_content import copy_content, copy_files, scan_static, sync_content
+from fixtures import read_file, temp_dir, write_file
+
+
+class TestSyncContent(unittest.TestCase):
+    def setUp(self):
+        self.tmp = temp_dir(self)
+        self.source = os.path.join(self.tmp, "static")
+        self.target = os.path.join(self.tmp, "docs")
+        write_file(os.path.join(self.source, "index.css"), "body {}", 1000)
+        write_file(os.path.join(self.source, "images", "a.png"), "png", 1000)
+        self.css = os.path.join(self.target, "index.css")
+        self.png = os.path.join(self.target, "images", "a.png")
+
+    def sync(self, previous=None, use_hash=False, link=False):
+        output = StringIO()
+        with redirect_stdout(output):
+            index = sync_content(self.source, self.target, previous,
+                                 use_hash, link)
+        return index, output.getvalue()
+
+    def test_scan_static(self):
+        self.assertEqual(scan_static(self.source), {
+            "index.css": [7, 1000 * 10**9],
+            os.path.join("images", "a.png"): [3, 1000 * 10**9],
+        })
+
+    def test_copies_new_files_and_preserves_mtime(self):
+        _, output = self.sync()
+        self.assertEqual(read_file(self.css), "body {}")
+        self.assertEqual(read_file(self.png), "png")
+        self.assertEqual(os.stat(self.css).st_mtime, 1000)
+        self.assertIn("2 copied, 0 unchanged, 0 removed", output)
+
+    def test_skips_unchanged_files(self):
+        self.sync()
+        write_file(self.css, "stale", 1000)
+        write_file(self.png, "old", 1000)
+        _, output = self.sync()
+        self.assertEqual(read_file(self.css), "body {}")
+        self.assertEqual(read_file(self.png), "old")
+        self.assertIn("1 copied, 1 unchanged", output)
+
+    def test_recopies_when_mtime_changes(self):
+        self.sync()
+        write_file(os.path.join(self.source, "images", "a.png"), "PNG", 2000)
+        self.sync()
+        self.assertEqual(read_file(self.png), "PNG")
+
+    def test_hash_skips_touched_files(self):
+        self.sync()
+        os.utime(os.path.join(self.source, "index.css"), (3000, 3000))
+        _, output = self.sync(use_hash=True)
+        self.assertIn("0 copied, 2 unchanged", output)
+        self.assertEqual(os.stat(self.css).st_mtime, 3000)
+
+    def test_copies_to_fingerprinted_names(self):
+        names = {"index.css": "index.1.css"}
+        index, _ = self.sync()
+        output = StringIO()
+        with redirect_stdout(output):
+            sync_content(self.source, self.target, index, names=names)
+        self.assertIn("1 copied, 1 unchanged, 1 removed", output.getvalue())
+        self.assertFalse(os.path.exists(self.css))
+        self.assertEqual(read_file(os.path.join(self.target, "index.1.css")),
+                         "body {}")
+
+        with redirect_stdout(StringIO()):
+            sync_content(self.source, self.target, index,
+                         previous_names=names)
+        self.assertFalse(os.path.exists(os.path.join(self.target,
+                                                     "index.1.css")))
+        self.assertEqual(read_file(self.css), "body {}")
+
+    def test_prunes_removed_files(self):
+        index, _ = self.sync()
+        os.remove(os.path.join(self.source, "images", "a.png"))
+        write_file(os.path.join(self.target, "index.html"), "page")
+        _, output = self.sync(index)
+        self.assertFalse(os.path.exists(self.png))
+        self.assertFalse(os.path.exists(os.path.dirname(self.png)))
+        self.assertTrue(os.path.exists(os.path.join(self.target,
+                                                    "index.html")))
+        self.assertIn("1 removed", output)
+
+    def test_hard_links(self):
+        self.sync(link=True)
+        self.assertTrue(os.path.samefile(
+            self.css, os.path.join(self.source, "index.css")))
+
+
+class TestCopyContent(unittest.TestCase):
+    def setUp(self):
+        self.tmp = temp_dir(self)
+        self.source = os.path.join(self.tmp, "static")
+        self.target = os.path.join(self.tmp, "docs")
+        self.files = {
+            os.path.join(f"dir{i % 7}", f"sub{i % 3}", f"file{i}.txt"):
+            f"content {i}"
+            for i in range(100)
+        }
+        for relative, text in self.files.items():
+            write_file(os.path.join(self.source, relative), text)
+
+    def test_copies_tree_with_one_summary_line(self):
+        output = StringIO()
+        with redirect_stdout(output):
+            copy_content(self.source, self.target, workers=4)
+        for relative, text in self.files.items():
+            self.assertEqual(read_file(os.path.join(self.target, relative)),
+                             text)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertIn("100 files", lines[0])
+        self.assertIn("files/s", lines[0])
+
+    def test_missing_source(self):
+        with self.assertRaises(Exception) as context:
+            copy_content(os.path.join(self.tmp, "missing"), self.target)
+        self.assertEqual(str(context.exception),
+                         "Error: Source directory does not exist")
+
+    def test_copy_error_is_raised(self):
+        missing = os.path.join(self.source, "missing.txt")
+        with self.assertRaises(Exception) as context:
+            copy_files([(missing, os.path.join(self.target, "missing.txt"))])
+        self.assertIn(missing, str(context.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest.mock import patch
+
+from depgraph import (TEMPLATE, DependencyGraph, normalize_url,
+                      page_references, source_url)
+from fixtures import write_file
+from generate_page import generate_pages_incremental
+
+
+class TestDependencyGraph(unittest.TestCase):
+    def setUp(self):
+        self.graph = DependencyGraph({
+            "index.md": ["/blog/post", "/images/a.png"],
+            "blog/post/index.md": ["/", "/images/a.png"],
+        })
+
+    def test_normalize_url(self):
+        self.assertEqual(normalize_url("/blog/post/index.html#top"),
+                         "/blog/post")
+        self.assertEqual(normalize_url("/blog/post/?page=2"), "/blog/post")
+        self.assertEqual(normalize_url("/index.html"), "/")
+        self.assertEqual(normalize_url("/"), "/")
+
+    def test_source_url(self):
+        self.assertEqual(source_url("index.md"), "/")
+        self.assertEqual(source_url("blog/post/index.md"), "/blog/post")
+        self.assertEqual(source_url("about.md"), "/about")
+
+    def test_page_references(self):
+        markdown = ("# Home\n\nSee [post](/blog/post/) and "
+                    "![img](/images/a.png)\n\n"
+                    "```\n[skipped](/code)\n```\n\n"
+                    "[external](https://example.com)")
+        self.assertEqual(page_references(markdown.split("\n")),
+                         ["/blog/post", "/images/a.png"])
+
+    def test_dependents(self):
+        self.assertEqual(self.graph.dependents("/images/a.png"),
+                         ["blog/post/index.md", "index.md"])
+        self.assertEqual(self.graph.dependents("/blog/post/index.html"),
+                         ["index.md"])
+        self.graph.remove_page("index.md")
+        self.assertEqual(self.graph.dependents("/blog/post"), [])
+
+    def test_rebuild_set(self):
+        pages = {"index.md", "blog/post/index.md"}
+        self.assertEqual(self.graph.rebuild_set({"index.md"}, pages),
+                         {"index.md"})
+        self.assertEqual(self.graph.rebuild_set({TEMPLATE}, pages), pages)
+
+    def test_dependents_of_path(self):
+        self.assertEqual(
+            self.graph.dependents_of_path("static/images/a.png", "content",
+                                          "static", "template.html"),
+            ["blog/post/index.md", "index.md"])
+        self.assertEqual(
+            self.graph.dependents_of_path("content/blog/post/index.md",
+                                          "content", "static",
+                                          "template.html"),
+            ["index.md"])
+        self.assertEqual(
+            self.graph.dependents_of_path("template.html", "content",
+                                          "static", "template.html"),
+            ["blog/post/index.md", "index.md"])
+        with self.assertRaises(Exception):
+            self.graph.dependents_of_path("elsewhere.txt", "content",
+                                          "static", "template.html")
+
+
+class TestBuildDependencies(unittest.TestCase):
+    def test_build_records_dependencies(self):
+        with tempfile.TemporaryDirectory() as root:
+            content = os.path.join(root, "content")
+            write_file(os.path.join(content, "index.md"),
+                       "# Home\n\n[About](/about) ![a](/images/a.png)")
+            write_file(os.path.join(content, "about.md"),
+                       "# About\n\n[Home](/)")
+            template = os.path.join(root, "template.html")
+            write_file(template, "{{ Title }}{{ Content }}")
+            manifest_path = os.path.join(root, "manifest.json")
+            with redirect_stdout(StringIO()):
+                generate_pages_incremental(content, template,
+                                           os.path.join(root, "docs"),
+                                           manifest_path)
+            with open(manifest_path) as f:
+                graph = DependencyGraph(json.load(f)["dependencies"])
+            self.assertEqual(graph.dependents("/about"), ["index.md"])
+            self.assertEqual(graph.dependents("/"), ["about.md"])
+
+    def build_dependencies(self, root, **options):
+        with redirect_stdout(StringIO()):
+            generate_pages_incremental(os.path.join(root, "content"),
+                                       os.path.join(root, "template.html"),
+                                       os.path.join(root, "docs"),
+                                       os.path.join(root, "manifest.json"),
+                                       **options)
+        with open(os.path.join(root, "manifest.json")) as f:
+            return json.load(f)["dependencies"]
+
+    def test_references_are_collected_while_rendering(self):
+        expected = {"index.md": ["/about", "/images/a.png"],
+                    "about.md": ["/"]}
+        for options in ({}, {"pipeline": True}, {"memo_size": 0}):
+            with tempfile.TemporaryDirectory() as root:
+                content = os.path.join(root, "content")
+                # The link is repeated so that the inline memo serves it.
+                write_file(os.path.join(content, "index.md"),
+                           "# Home\n\n- [About](/about)\n- [About](/about)"
+                           "\n\n![a](/images/a.png)")
+                write_file(os.path.join(content, "about.md"),
+                           "# About\n\n[Home](/index.html)\n\n"
+                           "```\n[Code](/code)\n```")
+                write_file(os.path.join(root, "template.html"),
+                           "{{ Title }}{{ Content }}")
+                with patch("generate_page.page_references",
+                           side_effect=AssertionError("parsed twice")):
+                    self.assertEqual(
+                        self.build_dependencies(root, **options), expected)
+
+    def test_cached_pages_keep_their_references(self):
+        with tempfile.TemporaryDirectory() as root:
+            write_file(os.path.join(root, "content", "index.md"),
+                       "# Home\n\n[About](/about)")
+            write_file(os.path.join(root, "template.html"), "{{ Content }}")
+            cache_dir = os.path.join(root, "cache")
+            self.build_dependencies(root, cache_dir=cache_dir)
+            os.remove(os.path.join(root, "manifest.json"))
+            self.assertEqual(
+                self.build_dependencies(root, cache_dir=cache_dir),
+                {"index.md": ["/about"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,191 @@
+import os
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest.mock import patch
+
+from fixtures import read_file, temp_dir, write_file
+from generate_page import (find_pages, generate_pages_incremental,
+                           shard_pages)
+from manifest import hash_file
+
+TEMPLATE = "<title>{{ Title }}</title><a href=\"/\">{{ Content }}</a>"
+
+
+class TestIncrementalBuild(unittest.TestCase):
+    def setUp(self):
+        root = temp_dir(self)
+        self.content = os.path.join(root, "content")
+        self.dest = os.path.join(root, "docs")
+        self.template = os.path.join(root, "template.html")
+        self.manifest = os.path.join(root, "manifest.json")
+        write_file(self.template, TEMPLATE)
+        write_file(os.path.join(self.content, "index.md"), "# Home")
+        write_file(os.path.join(self.content, "blog", "post", "index.md"),
+                   "# Post\n\nSome **text**")
+        self.index_html = os.path.join(self.dest, "index.html")
+        self.post_html = os.path.join(self.dest, "blog", "post", "index.html")
+
+    def build(self, basepath="/", jobs=1, pipeline=False):
+        output = StringIO()
+        with redirect_stdout(output):
+            generate_pages_incremental(self.content, self.template,
+                                       self.dest, self.manifest, basepath,
+                                       jobs, pipeline=pipeline)
+        return output.getvalue()
+
+    def test_find_pages(self):
+        self.assertEqual(
+            find_pages(self.content, self.dest),
+            [
+                (os.path.join(self.content, "blog", "post", "index.md"),
+                 self.post_html),
+                (os.path.join(self.content, "index.md"), self.index_html),
+            ],
+        )
+
+    def test_initial_build(self):
+        self.build()
+        self.assertEqual(read_file(self.index_html),
+                         '<title> Home</title><a href="/"><div><h1>Home</h1>'
+                         '</div></a>')
+        self.assertTrue(os.path.exists(self.post_html))
+        self.assertTrue(os.path.exists(self.manifest))
+
+    def test_unchanged_pages_are_skipped(self):
+        self.build()
+        write_file(self.index_html, "stale")
+        self.build()
+        self.assertEqual(read_file(self.index_html), "stale")
+
+    def test_changed_content_is_regenerated(self):
+        self.build()
+        write_file(self.index_html, "stale")
+        write_file(self.post_html, "stale")
+        write_file(os.path.join(self.content, "index.md"), "# New home")
+        self.build()
+        self.assertIn("New home", read_file(self.index_html))
+        self.assertEqual(read_file(self.post_html), "stale")
+
+    def test_template_change_regenerates_everything(self):
+        self.build()
+        write_file(self.index_html, "stale")
+        write_file(self.template, "<p>{{ Content }}</p>")
+        self.build()
+        self.assertEqual(read_file(self.index_html),
+                         "<p><div><h1>Home</h1></div></p>")
+
+    def test_basepath_change_regenerates_everything(self):
+        self.build()
+        self.build("/site/")
+        self.assertIn('href="/site/"', read_file(self.index_html))
+
+    def test_streamed_page_matches_in_memory(self):
+        write_file(os.path.join(self.content, "index.md"),
+                   "intro\n\n# Home\n\n- [a](/a)\n- b\n\n```\ncode\n```\n")
+        self.build()
+        in_memory = read_file(self.index_html)
+        os.remove(self.manifest)
+        with patch("generate_page.STREAM_THRESHOLD_BYTES", 0):
+            self.build()
+        self.assertEqual(read_file(self.index_html), in_memory)
+
+    def test_identical_output_is_not_rewritten(self):
+        self.build()
+        os.utime(self.index_html, (0, 0))
+        write_file(os.path.join(self.content, "blog", "post", "index.md"),
+                   "# Post\n\nOther **text**")
+        os.remove(self.manifest)
+        output = self.build()
+        self.assertIn("Generated 2 pages (1 changed on disk)", output)
+        self.assertEqual(os.path.getmtime(self.index_html), 0)
+        self.assertIn("Other", read_file(self.post_html))
+        self.assertEqual(os.listdir(os.path.dirname(self.post_html)),
+                         ["index.html"])
+
+    def test_old_unchanged_sources_are_not_rehashed(self):
+        source = os.path.join(self.content, "index.md")
+        self.build()
+        os.utime(source, ns=(10**18, 10**18))
+        self.build()
+        with patch("generate_page.hash_file", wraps=hash_file) as hashed:
+            self.build()
+        hashed_paths = [call.args[0] for call in hashed.call_args_list]
+        self.assertNotIn(source, hashed_paths)
+        self.assertIn(self.template, hashed_paths)
+
+    def test_recent_same_stat_edit_is_detected(self):
+        source = os.path.join(self.content, "index.md")
+        self.build()
+        stat = os.stat(source)
+        write_file(source, "# Hone")
+        os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.build()
+        self.assertIn("Hone", read_file(self.index_html))
+
+    def test_missing_output_is_regenerated(self):
+        self.build()
+        os.remove(self.post_html)
+        self.build()
+        self.assertTrue(os.path.exists(self.post_html))
+
+    def test_deleted_source_removes_output(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "post", "index.md"))
+        self.build()
+        self.assertFalse(os.path.exists(self.post_html))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "blog")))
+        self.assertTrue(os.path.exists(self.index_html))
+
+
+class TestParallelBuild(TestIncrementalBuild):
+    def build(self, basepath="/", jobs=2):
+        return super().build(basepath, jobs)
+
+    def test_parallel_matches_serial(self):
+        self.build()
+        parallel = [read_file(self.index_html), read_file(self.post_html)]
+        os.remove(self.manifest)
+        super().build(jobs=1)
+        serial = [read_file(self.index_html), read_file(self.post_html)]
+        self.assertEqual(parallel, serial)
+
+    def test_shard_pages_balances_by_size(self):
+        pages = find_pages(self.content, self.dest)
+        shards = shard_pages(pages, 2)
+        self.assertEqual(len(shards), 2)
+        self.assertEqual(sorted(shards[0] + shards[1]), sorted(pages))
+        self.assertEqual(shard_pages(pages, 4), [[pages[0]], [pages[1]]])
+
+
+class TestPipelinedBuild(TestIncrementalBuild):
+    def build(self, basepath="/", jobs=1, pipeline=True):
+        return super().build(basepath, jobs, pipeline)
+
+    def test_pipeline_matches_serial(self):
+        self.build()
+        pipelined = [read_file(self.index_html), read_file(self.post_html)]
+        os.remove(self.manifest)
+        super().build(pipeline=False)
+        serial = [read_file(self.index_html), read_file(self.post_html)]
+        self.assertEqual(pipelined, serial)
+
+    def test_many_pages_through_bounded_queues(self):
+        for i in range(150):
+            write_file(os.path.join(self.content, f"p{i}", "index.md"),
+                       f"# Page {i}")
+        with patch("generate_page.PIPELINE_QUEUE_SIZE", 2):
+            self.build()
+        self.assertIn("Page 149", read_file(
+            os.path.join(self.dest, "p149", "index.html")))
+
+    def test_render_error_stops_pipeline(self):
+        write_file(os.path.join(self.content, "bad", "index.md"), "no title")
+        with self.assertRaises(Exception) as context:
+            self.build()
+        self.assertEqual(str(context.exception),
+                         "No level 1 header present in the text")
+
+
+if __name__ == "__main__":
+    unittest.main()
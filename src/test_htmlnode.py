@@ -94,6 +94,28 @@ class TestHTMLNode(unittest.TestCase):
                          '<a href="https://www.google.com"><p>This is some '
                          'text</p><b>This is some more text</b></a>')
 
+    def test_nodes_have_no_instance_dict(self):
+        for node in [HTMLNode(), LeafNode("b", "x"), ParentNode("p", [])]:
+            self.assertFalse(hasattr(node, "__dict__"))
+
+    def test_write_html_streams_chunks(self):
+        parent_node = ParentNode("ul", [
+            ParentNode("li", [LeafNode("b", "one")]),
+            ParentNode("li", [LeafNode(None, "two")]),
+        ])
+        chunks = []
+        parent_node.write_html(chunks.append)
+        self.assertEqual(chunks, ["<ul>", "<li>", "<b>one</b>", "</li>",
+                                  "<li>", "two", "</li>", "</ul>"])
+        self.assertEqual("".join(chunks), parent_node.to_html())
+
+    def test_write_html_deep_tree(self):
+        node = LeafNode(None, "leaf")
+        for _ in range(200):
+            node = ParentNode("span", [node])
+        self.assertEqual(node.to_html(),
+                         "<span>" * 200 + "leaf" + "</span>" * 200)
+
 
 class TestMarkdownToHTML(unittest.TestCase):
     def test_paragraphs(self):
@@ -0,0 +1,238 @@
+import os
+import struct
+import unittest
+import zlib
+from contextlib import redirect_stdout
+from io import StringIO
+
+from benchmark import generate_corpus, run_build
+from copy_content import scan_static
+from fixtures import read_file, temp_dir, write_file
+from generate_page import generate_pages_incremental
+from images import (PNG_SIGNATURE, add_bytes, byte_masks, chunk, decode_png,
+                    encode_png, image_urls, png_header, process_images,
+                    resize, scan_images, subtract_bytes, sync_variants,
+                    variant_name)
+from template import LinkRewriter
+
+TEMPLATE = "<title>{{ Title }}</title>{{ Content }}"
+
+
+def paeth(a, b, c):
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    return b if pb <= pc else c
+
+
+def filter_row(kind, row, previous, bpp):
+    # Reference encoder for the filters the decoder has to undo.
+    filtered = bytearray()
+    for i, value in enumerate(row):
+        a = row[i - bpp] if i >= bpp else 0
+        b = previous[i]
+        c = previous[i - bpp] if i >= bpp else 0
+        predictor = [0, a, b, (a + b) >> 1, paeth(a, b, c)][kind]
+        filtered.append((value - predictor) & 0xFF)
+    return bytes((kind,)) + bytes(filtered)
+
+
+def make_png(width, height, color_type, rows, kinds):
+    bpp = {0: 1, 2: 3, 4: 2, 6: 4}[color_type]
+    previous = bytes(width * bpp)
+    lines = []
+    for row, kind in zip(rows, kinds):
+        lines.append(filter_row(kind, row, previous, bpp))
+        previous = row
+    header = struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) +
+            chunk(b"IDAT", zlib.compress(b"".join(lines))) +
+            chunk(b"IEND", b""))
+
+
+def gradient(width, height, bpp):
+    return [bytes((x * 7 + y * 13 + channel * 50) & 0xFF
+                  for x in range(width) for channel in range(bpp))
+            for y in range(height)]
+
+
+def write_png(path, width, height, color_type=2):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    rows = gradient(width, height, {0: 1, 2: 3, 6: 4}[color_type])
+    with open(path, "wb") as f:
+        f.write(encode_png(width, height, color_type, rows))
+
+
+class TestPng(unittest.TestCase):
+    def test_byte_arithmetic(self):
+        masks = byte_masks(1)
+        for a in range(256):
+            for b in range(256):
+                self.assertEqual(add_bytes(a, b, *masks), (a + b) & 0xFF)
+                self.assertEqual(subtract_bytes(a, b, *masks),
+                                 (a - b) & 0xFF)
+
+    def test_decode_every_filter(self):
+        for color_type, bpp in ((0, 1), (2, 3), (4, 2), (6, 4)):
+            rows = gradient(9, 10, bpp)
+            data = make_png(9, 10, color_type, rows,
+                            [0, 1, 2, 3, 4, 4, 3, 2, 1, 0])
+            self.assertEqual(decode_png(data)[:4], (9, 10, color_type, rows))
+
+    def test_encode_round_trip(self):
+        rows = gradient(33, 7, 4)
+        data = encode_png(33, 7, 6, rows, [(b"sRGB", b"\x00")])
+        self.assertEqual(decode_png(data), (33, 7, 6, rows,
+                                            [(b"sRGB", b"\x00")]))
+
+    def test_unsupported_png_is_not_decoded(self):
+        header = struct.pack(">IIBBBBB", 4, 4, 8, 3, 0, 0, 0)
+        data = (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) +
+                chunk(b"IEND", b""))
+        self.assertIsNone(decode_png(data))
+
+    def test_resize_averages_boxes(self):
+        rows = [bytes([0, 100, 10, 20]), bytes([50, 150, 30, 40])]
+        self.assertEqual(resize(rows, 4, 1, 2, 1), [bytes([75, 25])])
+        self.assertEqual(resize(rows, 2, 2, 1, 2),
+                         [bytes([5, 60]), bytes([40, 95])])
+
+
+class TestImagePipeline(unittest.TestCase):
+    def setUp(self):
+        root = temp_dir(self)
+        self.static = os.path.join(root, "static")
+        self.dest = os.path.join(root, "docs")
+        self.cache = os.path.join(root, "cache")
+        self.png = os.path.join(self.static, "images", "a.png")
+        write_png(self.png, 1000, 20)
+        write_png(os.path.join(self.static, "small.png"), 100, 10)
+
+    def process(self, previous=None):
+        output = StringIO()
+        with redirect_stdout(output):
+            images = scan_images(self.static, scan_static(self.static),
+                                 previous)
+            process_images(self.static, images, self.cache, workers=1)
+        return images, output.getvalue()
+
+    def test_png_header(self):
+        self.assertEqual(png_header(self.png), (1000, 20, 8, 2, 0))
+
+    def test_variants_are_cached_by_content(self):
+        images, output = self.process()
+        relative = os.path.join("images", "a.png")
+        self.assertEqual(images[relative][3:], [1000, 20, [480, 960]])
+        self.assertEqual(images["small.png"][5], [])
+        self.assertIn("1 resized", output)
+
+        _, output = self.process(images)
+        self.assertIn("0 resized", output)
+        # A touched file is hashed again but its variants are reused.
+        os.utime(self.png, (3000, 3000))
+        _, output = self.process(images)
+        self.assertIn("0 resized", output)
+
+    def test_malformed_images_are_plain_files(self):
+        with open(self.png, "rb") as f:
+            data = f.read()
+        header_end = len(PNG_SIGNATURE) + 25
+        broken = os.path.join(self.static, "broken.png")
+        with open(broken, "wb") as f:
+            f.write(data[:header_end] + chunk(b"IDAT", b"junk") +
+                    chunk(b"IEND", b""))
+        with open(os.path.join(self.static, "cut.png"), "wb") as f:
+            f.write(data[:20])
+        with open(os.path.join(self.static, "noise.png"), "wb") as f:
+            f.write(os.urandom(100))
+
+        images, output = self.process()
+        self.assertNotIn("cut.png", images)
+        self.assertNotIn("noise.png", images)
+        for name in ("cut.png", "noise.png"):
+            self.assertIn(f"{os.path.join(self.static, name)} is not a "
+                          "valid PNG", output)
+        self.assertIn(f"could not resize {broken}", output)
+        self.assertEqual(images["broken.png"][3:], [1000, 20, []])
+        self.assertEqual(images[os.path.join("images", "a.png")][5],
+                         [480, 960])
+
+    def test_sync_variants(self):
+        images, _ = self.process()
+        names = {os.path.join("images", "a.png"):
+                 os.path.join("images", "a.1.png")}
+        with redirect_stdout(StringIO()):
+            outputs = sync_variants(images, self.dest, names,
+                                    cache_dir=self.cache)
+        self.assertEqual(outputs, [os.path.join("images", "a.1-480w.png"),
+                                   os.path.join("images", "a.1-960w.png")])
+        with open(os.path.join(self.dest, outputs[0]), "rb") as f:
+            self.assertEqual(decode_png(f.read())[:2], (480, 10))
+
+        with redirect_stdout(StringIO()):
+            sync_variants({}, self.dest, previous_outputs=outputs,
+                          cache_dir=self.cache)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "images")))
+
+    def test_image_attributes(self):
+        images, _ = self.process()
+        links = LinkRewriter("/site/", images=image_urls(images))
+        self.assertEqual(variant_name("a.png", 480), "a-480w.png")
+        self.assertEqual(links.image_attributes("/images/a.png"), {
+            "width": "1000",
+            "height": "20",
+            "srcset": "/site/images/a-480w.png 480w, "
+                      "/site/images/a-960w.png 960w, "
+                      "/site/images/a.png 1000w",
+            "sizes": "(max-width: 1000px) 100vw, 1000px",
+        })
+        self.assertEqual(links.image_attributes("/small.png"),
+                         {"width": "100", "height": "10"})
+        self.assertEqual(links.image_attributes("/other.png"), {})
+
+
+class TestImageBuild(unittest.TestCase):
+    def setUp(self):
+        root = temp_dir(self)
+        self.content = os.path.join(root, "content")
+        self.dest = os.path.join(root, "docs")
+        self.template = os.path.join(root, "template.html")
+        self.manifest = os.path.join(root, "manifest.json")
+        write_file(self.template, TEMPLATE)
+        write_file(os.path.join(self.content, "index.md"), "# Home")
+        write_file(os.path.join(self.content, "post.md"),
+                   "# Post\n\n![a](/a.png)")
+        self.images = {"/a.png": [600, 300, [["/a-480w.png", 480]]]}
+
+    def build(self):
+        output = StringIO()
+        with redirect_stdout(output):
+            generate_pages_incremental(self.content, self.template,
+                                       self.dest, self.manifest,
+                                       images=self.images)
+        return output.getvalue()
+
+    def test_changed_image_rebuilds_pages_that_show_it(self):
+        self.build()
+        self.assertIn('<img src="/a.png" alt="a" width="600" '
+                      'height="300" srcset="/a-480w.png 480w, '
+                      '/a.png 600w"',
+                      read_file(os.path.join(self.dest, "post.html")))
+        self.assertIn("Generated 0 pages", self.build())
+        self.images["/a.png"] = [640, 320, [["/a-480w.png", 480]]]
+        self.assertIn("Generated 1 pages", self.build())
+
+
+class TestImageSite(unittest.TestCase):
+    def test_benchmark_corpus_builds_with_images(self):
+        # The corpus images are random bytes named *.png.
+        root = temp_dir(self)
+        generate_corpus(root, 2)
+        run_build(root, ["--images"])
+        self.assertTrue(os.path.exists(os.path.join(root, "docs", "images",
+                                                    "image-0.png")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,11 @@
+import random
 import unittest
 
 from htmlnode import HTMLNode
 from inline_markdown import (extract_markdown_images, extract_markdown_links,
                              split_nodes_delimiter, split_nodes_image,
-                             split_nodes_link, text_to_textnodes)
+                             split_nodes_link, text_to_textnodes,
+                             text_to_textnodes_chained, tokenize_inline)
 from textnode import TextNode, TextType
 
 
@@ -260,5 +262,92 @@ class TestInlineMarkdown(unittest.TestCase):
                          "Invalid markdown: missing closing '_'")
 
 
+class TestTokenizeInline(unittest.TestCase):
+    def assertMatchesChain(self, text):
+        self.assertListEqual(tokenize_inline(text),
+                             text_to_textnodes_chained(text), text)
+
+    def test_edges(self):
+        for text in [
+            "",
+            "plain",
+            "**bold**",
+            "**a****b**",
+            "[link](/a)",
+            "![img](/a.png)",
+            "x [link](/a) **b**",
+            "**b**[link](/a)",
+            "[a](/a)[b](/b)![c](/c)",
+            "see [a](/a), _then_ [b](/b) and `code`",
+        ]:
+            self.assertMatchesChain(text)
+
+    def test_generated(self):
+        rng = random.Random(0)
+        pieces = ["word ", " ", "**bold**", "_italic_", "`code`",
+                  "[link {}](/page/{})", "![image {}](/img/{}.png)",
+                  "(", ")", "!",
+                  "[**bold {}**](/page/{})", "**see [link {}](/page/{})**",
+                  "_see ![image {}](/img/{}.png)_"]
+        for _ in range(500):
+            text = "".join(
+                rng.choice(pieces).format(*[rng.randrange(10**6)] * 2)
+                for _ in range(rng.randrange(12)))
+            self.assertMatchesChain(text)
+
+    def test_stray_bracket_before_image(self):
+        text = "a[0] then see ![img](/x.png)"
+        self.assertMatchesChain(text)
+        self.assertListEqual(
+            tokenize_inline(text),
+            [
+                TextNode("a[0] then see ", TextType.TEXT),
+                TextNode("img", TextType.IMAGE, "/x.png"),
+            ],
+        )
+
+    def test_stray_bracket_before_link(self):
+        self.assertListEqual(
+            tokenize_inline("[a [b](/b)"),
+            [
+                TextNode("[a ", TextType.TEXT),
+                TextNode("b", TextType.LINK, "/b"),
+            ],
+        )
+
+    def test_code_span_keeps_link(self):
+        self.assertListEqual(
+            tokenize_inline("`[a](/a)`"),
+            [
+                TextNode("", TextType.TEXT),
+                TextNode("[a](/a)", TextType.CODE),
+                TextNode("", TextType.TEXT),
+            ],
+        )
+
+    def test_link_url_keeps_underscores(self):
+        self.assertListEqual(
+            tokenize_inline("[docs](/a_b_c)"),
+            [TextNode("docs", TextType.LINK, "/a_b_c")],
+        )
+
+    def test_repeated_link_keeps_trailing_text(self):
+        self.assertListEqual(
+            tokenize_inline("[a](/a) x [a](/a) y"),
+            [
+                TextNode("a", TextType.LINK, "/a"),
+                TextNode(" x ", TextType.TEXT),
+                TextNode("a", TextType.LINK, "/a"),
+                TextNode(" y", TextType.TEXT),
+            ],
+        )
+
+    def test_unclosed_delimiter(self):
+        with self.assertRaises(Exception) as context:
+            tokenize_inline("a **b")
+        self.assertEqual(str(context.exception),
+                         "Invalid markdown: missing closing '**'")
+
+
 if __name__ == "__main__":
     unittest.main()
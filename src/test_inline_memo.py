@@ -0,0 +1,78 @@
+import unittest
+
+import htmlnode
+from htmlnode import markdown_to_html_node
+from inline_memo import DEFAULT_MAX_ENTRIES, MAX_TEXT_LENGTH, InlineMemo
+from template import LinkRewriter
+
+
+class TestInlineMemo(unittest.TestCase):
+    def test_stores_fragments_seen_twice(self):
+        memo = InlineMemo()
+        self.assertEqual(memo.lookup("a", None), (None, None))
+        html, key = memo.lookup("a", None)
+        self.assertIsNone(html)
+        memo.put(key, "A")
+        self.assertEqual(memo.lookup("a", None), ("A", None))
+        self.assertEqual(memo.stats(),
+                         "1 hits, 2 misses (33% hit rate, 1 entries)")
+
+    def test_evicts_least_recently_used(self):
+        memo = InlineMemo(2)
+        for text in ("a", "b", "a", "b"):
+            html, key = memo.lookup(text, None)
+            if key is not None:
+                memo.put(key, text.upper())
+        memo.lookup("a", None)
+        memo.lookup("c", None)
+        self.assertEqual(list(memo.entries), ["a", "c"])
+
+    def test_skips_long_text_and_disabled_memo(self):
+        memo = InlineMemo()
+        long_text = "x" * (MAX_TEXT_LENGTH + 1)
+        for _ in range(2):
+            self.assertEqual(memo.lookup(long_text, None), (None, None))
+        memo.resize(0)
+        for _ in range(2):
+            self.assertEqual(memo.lookup("x", None), (None, None))
+        self.assertEqual(memo.misses, 0)
+
+
+class TestMemoizedRendering(unittest.TestCase):
+    def setUp(self):
+        htmlnode.INLINE_MEMO.clear()
+        htmlnode.INLINE_MEMO.resize(DEFAULT_MAX_ENTRIES)
+
+    def tearDown(self):
+        htmlnode.INLINE_MEMO.resize(0)
+        htmlnode.INLINE_MEMO.clear()
+
+    def test_repeated_fragments_hit(self):
+        md = "\n\n".join(["See [home](/) **now**"] * 3 +
+                         ["- See [home](/) **now**"])
+        html = markdown_to_html_node(md).to_html()
+        fragment = 'See <a href="/">home</a> <b>now</b>'
+        self.assertEqual(html, f"<div>{f'<p>{fragment}</p>' * 3}"
+                         f"<ul><li>{fragment}</li></ul></div>")
+        self.assertEqual(htmlnode.INLINE_MEMO.hits, 2)
+
+    def test_basepath_is_not_shared(self):
+        md = "[home](/)\n\n[home](/)"
+        markdown_to_html_node(md, LinkRewriter("/"))
+        html = markdown_to_html_node(md, LinkRewriter("/site/")).to_html()
+        self.assertEqual(html, '<div><p><a href="/site/">home</a></p>'
+                         '<p><a href="/site/">home</a></p></div>')
+
+
+class TestLibraryRendering(unittest.TestCase):
+    def test_memo_is_off_by_default(self):
+        htmlnode.INLINE_MEMO.clear()
+        md = "See **this**\n\nSee **this**\n\nSee **this**"
+        trees = [markdown_to_html_node(md) for _ in range(2)]
+        self.assertEqual(trees[0], trees[1])
+        self.assertEqual(len(trees[1].children[2].children), 3)
+        self.assertEqual(htmlnode.INLINE_MEMO.misses, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from copy_content import sync_content
+from fixtures import read_file, temp_dir, write_file
+from generate_page import generate_pages_incremental
+from htmlnode import VoidNode
+from minify import minify_css, minify_html
+
+TEMPLATE = """<!doctype html>
+<html>
+  <head>
+    <!-- page title -->
+    <title>{{ Title }}</title>
+    <link href="/index.css" rel="stylesheet" />
+  </head>
+  <body>
+    <article>{{ Content }}</article>
+  </body>
+</html>
+"""
+
+
+class TestMinify(unittest.TestCase):
+    def test_minify_html(self):
+        self.assertEqual(
+            minify_html(TEMPLATE),
+            '<!doctype html><html><head><title>{{ Title }}</title>'
+            '<link href="/index.css" rel="stylesheet"></head><body>'
+            '<article>{{ Content }}</article></body></html>')
+
+    def test_minify_html_keeps_inline_spaces(self):
+        self.assertEqual(minify_html("<p>a  <b>b</b>\n <i>c</i> </p>"),
+                         "<p>a <b>b</b> <i>c</i></p>")
+
+    def test_minify_html_keeps_raw_elements(self):
+        html = "<div>\n<pre><code>  a\n\n  b </code></pre>\n</div>"
+        self.assertEqual(minify_html(html),
+                         "<div><pre><code>  a\n\n  b </code></pre></div>")
+
+    def test_minify_css(self):
+        css = """
+        /* links */
+        a > b ,
+        a:hover {
+          content: "a ;  /* b */ }" ;
+          width: calc(100% - 2px) ;
+        }
+        """
+        self.assertEqual(minify_css(css),
+                         'a>b,a:hover{content:"a ;  /* b */ }";'
+                         'width:calc(100% - 2px)}')
+
+    def test_void_node(self):
+        node = VoidNode("img", {"src": "/a.png", "alt": ""})
+        self.assertEqual(node.to_html(), '<img src="/a.png" alt="">')
+
+
+class TestMinifiedBuild(unittest.TestCase):
+    def setUp(self):
+        root = temp_dir(self)
+        self.content = os.path.join(root, "content")
+        self.static = os.path.join(root, "static")
+        self.dest = os.path.join(root, "docs")
+        self.template = os.path.join(root, "template.html")
+        self.manifest = os.path.join(root, "manifest.json")
+        write_file(self.template, TEMPLATE)
+        write_file(os.path.join(self.content, "index.md"),
+                   "# Home\n\n![a](/a.png)\n\n```\n  x  =  1\n    y\n```")
+        write_file(os.path.join(self.static, "index.css"),
+                   "a {\n  color: red;\n}\n", 1000)
+        self.minified = {}
+
+    def build(self, minify=True):
+        output = StringIO()
+        with redirect_stdout(output):
+            generate_pages_incremental(self.content, self.template,
+                                       self.dest, self.manifest,
+                                       minify=minify)
+        return output.getvalue()
+
+    def sync(self, minify=True):
+        output = StringIO()
+        with redirect_stdout(output):
+            sync_content(self.static, self.dest, minify=minify,
+                         minified=self.minified)
+        return output.getvalue()
+
+    def test_minified_page(self):
+        self.build()
+        self.assertEqual(
+            read_file(os.path.join(self.dest, "index.html")),
+            '<!doctype html><html><head><title> Home</title>'
+            '<link href="/index.css" rel="stylesheet"></head><body>'
+            '<article><div><h1>Home</h1><p><img src="/a.png" alt="a"></p>'
+            '<pre><code>  x  =  1\n    y\n</code></pre></div></article>'
+            '</body></html>')
+
+    def test_toggling_minify_regenerates_pages(self):
+        self.build()
+        self.assertIn("Generated 0 pages", self.build())
+        self.assertIn("Generated 1 pages", self.build(minify=False))
+        self.assertIn("</img>",
+                      read_file(os.path.join(self.dest, "index.html")))
+
+    def test_css_is_minified_once(self):
+        css = os.path.join(self.dest, "index.css")
+        self.assertIn("Minified 1 stylesheets", self.sync())
+        self.assertEqual(read_file(css), "a{color:red}")
+        stat = os.stat(css)
+        self.assertEqual(self.minified, {"index.css": [
+            20, 1000 * 10**9, stat.st_size, stat.st_mtime_ns]})
+        self.assertNotIn("Minified", self.sync())
+
+        self.sync(minify=False)
+        self.assertEqual(self.minified, {})
+        self.assertEqual(read_file(css), "a {\n  color: red;\n}\n")
+        self.assertIn("Minified 1 stylesheets", self.sync())
+
+    def test_minified_source_is_minified_once(self):
+        write_file(os.path.join(self.static, "index.css"), "a{color:red}",
+                   2000)
+        self.assertIn("Minified 1 stylesheets", self.sync())
+        self.assertNotIn("Minified", self.sync())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import unittest
+from unittest.mock import patch
+
+from fixtures import temp_dir
+from generate_page import parse_page
+from parse_cache import ParseCache
+from template import LinkRewriter, Template
+
+
+class TestParseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = temp_dir(self)
+        self.cache = ParseCache(self.tmp)
+        self.links = LinkRewriter()
+
+    def test_get_and_put(self):
+        key = self.cache.key("# Hi", self.links)
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, "<div><h1>Hi</h1></div>")
+        self.assertEqual(self.cache.get(key), "<div><h1>Hi</h1></div>")
+        self.assertEqual(self.cache.stats(), "1 hits, 1 misses")
+
+    def test_key_depends_on_content_basepath_and_version(self):
+        key = self.cache.key("# Hi", self.links)
+        self.assertNotEqual(key, self.cache.key("# Ho", self.links))
+        self.assertNotEqual(key,
+                            self.cache.key("# Hi", LinkRewriter("/site/")))
+        with patch("parse_cache.PARSER_VERSION", "old"):
+            self.assertNotEqual(key, self.cache.key("# Hi", self.links))
+
+    def test_evicts_least_recently_used(self):
+        cache = ParseCache(self.tmp, max_bytes=250)
+        for i, key in enumerate(["a" * 64, "b" * 64, "c" * 64]):
+            cache.put(key, "x" * 100)
+            os.utime(cache.path(key), (i, i))
+        self.assertIsNone(cache.get("a" * 64))
+        self.assertEqual(cache.get("b" * 64), "x" * 100)
+        self.assertEqual(cache.get("c" * 64), "x" * 100)
+
+    def test_parse_page_uses_cache(self):
+        template = Template("{{ Content }}")
+        title, node = parse_page("# Hi", template, self.cache)
+        self.assertEqual(node.to_html(), "<div><h1>Hi</h1></div>")
+        with patch("generate_page.markdown_to_html_node") as parse:
+            title, node = parse_page("# Hi", template, self.cache)
+            parse.assert_not_called()
+        self.assertEqual(title, " Hi")
+        self.assertEqual(node.to_html(), "<div><h1>Hi</h1></div>")
+
+
+if __name__ == "__main__":
+    unittest.main()
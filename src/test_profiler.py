@@ -0,0 +1,84 @@
+import json
+import os
+import unittest
+from contextlib import chdir, redirect_stdout
+from io import StringIO
+
+import generate_page
+import htmlnode
+import main as site
+from benchmark import generate_corpus
+from fixtures import temp_dir, write_file
+from profiler import STAGES, Profiler
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        htmlnode.INLINE_MEMO.clear()
+        self.tmp = temp_dir(self)
+        self.source = os.path.join(self.tmp, "index.md")
+        self.template = os.path.join(self.tmp, "template.html")
+        self.dest = os.path.join(self.tmp, "index.html")
+        write_file(self.source, "# Title\n\n- one\n- **two**\n\nA [link](/a)")
+        write_file(self.template, "{{ Title }}{{ Content }}")
+
+    def profile_build(self):
+        profiler = Profiler()
+        profiler.install()
+        try:
+            with redirect_stdout(StringIO()):
+                generate_page.generate_page(self.source, self.template,
+                                            self.dest)
+        finally:
+            profiler.uninstall()
+        return profiler
+
+    def test_records_stages_and_pages(self):
+        trace = self.profile_build().trace()
+        stages = trace["stages"]
+        self.assertEqual(stages["markdown_to_blocks"]["calls"], 1)
+        self.assertEqual(stages["classify_block"]["calls"], 3)
+        self.assertEqual(stages["text_to_textnodes"]["calls"], 4)
+        self.assertEqual(stages["write"]["calls"], 1)
+        self.assertGreater(stages["to_html"]["calls"], 1)
+        self.assertLessEqual(stages["to_html"]["total_seconds"],
+                             stages["template"]["total_seconds"])
+        self.assertEqual([page["path"] for page in trace["pages"]],
+                         [self.source])
+
+    def test_self_time_excludes_nested_stages(self):
+        stages = self.profile_build().trace()["stages"]
+        write = stages["write"]
+        self.assertLess(write["self_seconds"], write["total_seconds"])
+
+    def test_uninstall_restores_functions(self):
+        originals = [getattr(owner, attribute)
+                     for _, owner, attribute in STAGES]
+        self.profile_build()
+        self.assertEqual([getattr(owner, attribute)
+                          for _, owner, attribute in STAGES], originals)
+        self.assertIs(htmlnode.ParentNode.write_html,
+                      htmlnode.ParentNode.__dict__["write_html"])
+
+    def test_report_and_dump(self):
+        profiler = self.profile_build()
+        output = StringIO()
+        with redirect_stdout(output):
+            profiler.report(top=1)
+        self.assertIn("Slowest 1 pages:", output.getvalue())
+        path = os.path.join(self.tmp, "trace.json")
+        profiler.dump(path)
+        with open(path) as f:
+            self.assertIn("stages", json.load(f))
+
+    def test_profile_renders_pages_without_pipeline(self):
+        root = os.path.join(self.tmp, "site")
+        generate_corpus(root, 3)
+        output = StringIO()
+        with chdir(root), redirect_stdout(output):
+            site.main(["--profile", "--pipeline", "--profile-top", "5"])
+        self.assertIn("Slowest 3 pages:", output.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
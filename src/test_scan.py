@@ -0,0 +1,28 @@
+import os
+import tempfile
+import unittest
+
+from fixtures import write_file
+from scan import DIRECTORY, FILE, scan_tree, tree_files
+
+
+class TestScanTree(unittest.TestCase):
+    def test_records_files_and_directories(self):
+        with tempfile.TemporaryDirectory() as root:
+            write_file(os.path.join(root, "a", "b", "page.md"), "hello")
+            write_file(os.path.join(root, "top.md"), "")
+
+            tree = scan_tree(root)
+            page = os.path.join("a", "b", "page.md")
+            self.assertEqual(
+                {relative: kind for relative, (_, _, kind) in tree.items()},
+                {"a": DIRECTORY, os.path.join("a", "b"): DIRECTORY,
+                 page: FILE, "top.md": FILE})
+            stat = os.stat(os.path.join(root, page))
+            self.assertEqual(tree_files(tree)[page],
+                             (5, stat.st_mtime_ns))
+            self.assertEqual(set(tree_files(tree)), {page, "top.md"})
+
+
+if __name__ == "__main__":
+    unittest.main()
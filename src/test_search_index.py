@@ -0,0 +1,150 @@
+import json
+import os
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from fixtures import temp_dir, write_file
+from generate_page import generate_pages_incremental
+from htmlnode import LeafNode, ParentNode
+from search_index import IndexedNode, PageText, page_url
+
+TEMPLATE = "<title>{{ Title }}</title><main>{{ Content }}</main>"
+
+
+def read_json(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+class TestPageText(unittest.TestCase):
+    def test_headings_and_terms(self):
+        text = PageText()
+        text.title = " Home "
+        text.feed("<div><h1>Home <b>page</b></h1><p>A tale of ")
+        text.feed("Middle-earth</p><h2>More</h2></div>")
+        self.assertEqual(text.entry(), {
+            "title": "Home",
+            "headings": ["Home page", "More"],
+            "words": 8,
+            "terms": ["earth", "home", "middle", "more", "of", "page",
+                      "tale"],
+        })
+
+    def test_indexed_node_tees_html(self):
+        node = ParentNode("p", [LeafNode(None, "Hello "),
+                                LeafNode("b", "world")])
+        text = PageText()
+        chunks = []
+        IndexedNode(node, text).write_html(chunks.append)
+        self.assertEqual("".join(chunks), node.to_html())
+        self.assertEqual(text.terms, {"hello", "world"})
+
+    def test_page_url(self):
+        self.assertEqual(page_url("index.html"), "/")
+        self.assertEqual(page_url(os.path.join("blog", "post",
+                                               "index.html")),
+                         "/blog/post/")
+        self.assertEqual(page_url("about.html"), "/about.html")
+
+
+class TestSearchIndexBuild(unittest.TestCase):
+    def setUp(self):
+        root = temp_dir(self)
+        self.content = os.path.join(root, "content")
+        self.dest = os.path.join(root, "docs")
+        self.template = os.path.join(root, "template.html")
+        self.manifest = os.path.join(root, "manifest.json")
+        self.sitemap = os.path.join(self.dest, "search", "sitemap.json")
+        self.terms = os.path.join(self.dest, "search", "terms")
+        write_file(self.template, TEMPLATE)
+        write_file(os.path.join(self.content, "index.md"),
+                   "# Home\n\nWelcome to the shire")
+        write_file(os.path.join(self.content, "blog", "post", "index.md"),
+                   "# Post\n\n## Rivendell\n\nThe last homely house")
+
+    def build(self, basepath="/", jobs=1, pipeline=False, search=True):
+        output = StringIO()
+        with redirect_stdout(output):
+            generate_pages_incremental(self.content, self.template,
+                                       self.dest, self.manifest, basepath,
+                                       jobs, pipeline=pipeline, search=search)
+        return output.getvalue()
+
+    def test_sitemap_and_terms(self):
+        self.build(basepath="/site/")
+        sitemap = read_json(self.sitemap)
+        self.assertEqual(sitemap["prefix_length"], 2)
+        self.assertEqual(
+            [(page["path"], page["title"], page["headings"])
+             for page in sitemap["pages"]],
+            [("/site/", "Home", ["Home"]),
+             ("/site/blog/post/", "Post", ["Post", "Rivendell"])])
+        ids = {page["title"]: page["id"] for page in sitemap["pages"]}
+        self.assertEqual(read_json(os.path.join(self.terms, "ho.json")),
+                         {"home": [ids["Home"]],
+                          "homely": [ids["Post"]],
+                          "house": [ids["Post"]]})
+        self.assertEqual(read_json(os.path.join(self.terms, "th.json")),
+                         {"the": sorted(ids.values())})
+
+    def test_parallel_and_pipelined_builds_match_serial(self):
+        self.build()
+        expected = read_json(self.sitemap)
+        for options in ({"jobs": 2}, {"pipeline": True}):
+            os.remove(self.manifest)
+            os.remove(self.sitemap)
+            self.build(**options)
+            self.assertEqual(read_json(self.sitemap), expected)
+
+    def test_incremental_update(self):
+        self.build()
+        ids = {page["title"]: page["id"]
+               for page in read_json(self.sitemap)["pages"]}
+        write_file(os.path.join(self.content, "index.md"),
+                   "# Home\n\nWelcome to bree")
+        output = self.build()
+        # The site map, br.json and th.json, which loses the home page.
+        self.assertIn("3 written, 1 removed", output)
+        self.assertFalse(os.path.exists(os.path.join(self.terms, "sh.json")))
+        self.assertEqual(read_json(os.path.join(self.terms, "br.json")),
+                         {"bree": [ids["Home"]]})
+        self.assertEqual({page["title"]: page["id"]
+                          for page in read_json(self.sitemap)["pages"]},
+                         ids)
+
+        self.assertIn("0 written, 0 removed", self.build())
+
+    def test_removed_page_is_dropped(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "post", "index.md"))
+        self.build()
+        self.assertEqual([page["path"]
+                          for page in read_json(self.sitemap)["pages"]],
+                         ["/"])
+        self.assertFalse(os.path.exists(os.path.join(self.terms,
+                                                     "ri.json")))
+
+    def test_index_is_rebuilt_without_state(self):
+        self.build()
+        expected = read_json(self.sitemap)
+        os.remove(os.path.join(os.path.dirname(self.manifest),
+                               ".search-index.json"))
+        output = self.build()
+        self.assertIn("Generated 2 pages", output)
+        self.assertEqual(read_json(self.sitemap), expected)
+
+    def test_index_is_removed_without_search_index(self):
+        self.build()
+        state = os.path.join(os.path.dirname(self.manifest),
+                             ".search-index.json")
+        self.assertIn("Search index: removed", self.build(search=False))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "search")))
+        self.assertFalse(os.path.exists(state))
+        self.assertTrue(os.path.exists(os.path.join(self.dest,
+                                                    "index.html")))
+        self.assertNotIn("Search index", self.build(search=False))
+
+
+if __name__ == "__main__":
+    unittest.main()
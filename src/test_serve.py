@@ -0,0 +1,91 @@
+import os
+import unittest
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from io import StringIO
+
+from fixtures import temp_dir, write_file
+from serve import LazySite, start_lazy_server
+
+
+class TestLazySite(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Request lines are printed by the server threads, possibly after
+        # a test has already returned.
+        cls.stdout = redirect_stdout(StringIO())
+        cls.stdout.__enter__()
+        cls.server = start_lazy_server(None, 0)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.stdout.__exit__(None, None, None)
+
+    def setUp(self):
+        root = temp_dir(self)
+        self.content = os.path.join(root, "content")
+        self.static = os.path.join(root, "static")
+        self.template = os.path.join(root, "template.html")
+        write_file(self.template, "<main>{{ Content }}</main>")
+        self.index = os.path.join(self.content, "index.md")
+        write_file(self.index, "# Home\n\n[Blog](/blog/)")
+        self.post = os.path.join(self.content, "blog", "index.md")
+        write_file(self.post, "# Blog")
+        write_file(os.path.join(self.static, "index.css"), "body {}")
+
+        self.site = LazySite(self.content, self.static, self.template,
+                             "/site/")
+        self.server.site = self.site
+
+    def get(self, path):
+        with urllib.request.urlopen(self.url + path) as response:
+            return response.read().decode()
+
+    def test_renders_pages_on_request(self):
+        self.assertEqual(self.get("/site/"),
+                         '<main><div><h1>Home</h1><p><a href="/site/blog/">'
+                         'Blog</a></p></div></main>')
+        self.assertEqual(self.get("/site/blog/index.html"),
+                         "<main><div><h1>Blog</h1></div></main>")
+        self.assertEqual(self.get("/site/blog"),
+                         "<main><div><h1>Blog</h1></div></main>")
+
+    def test_serves_static_files(self):
+        self.assertEqual(self.get("/site/index.css"), "body {}")
+
+    def test_missing_pages_are_not_found(self):
+        for path in ("/site/missing/", "/other/", "/site/../template.html"):
+            with self.assertRaises(urllib.error.HTTPError) as context:
+                self.get(path)
+            self.assertEqual(context.exception.code, 404)
+
+    def test_caches_until_source_changes(self):
+        self.get("/site/blog/")
+        self.get("/site/blog/")
+        self.assertEqual((self.site.renders, self.site.hits), (1, 1))
+        write_file(self.post, "# Blog, edited")
+        self.assertIn("Blog, edited", self.get("/site/blog/"))
+        self.assertEqual(self.site.renders, 2)
+
+    def test_template_change_invalidates_pages(self):
+        self.get("/site/blog/")
+        write_file(self.template, "<p>{{ Content }}</p>")
+        self.assertEqual(self.get("/site/blog/"),
+                         "<p><div><h1>Blog</h1></div></p>")
+
+    def test_concurrent_requests(self):
+        paths = ["/site/", "/site/blog/", "/site/index.css"] * 10
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            bodies = list(executor.map(self.get, paths))
+        self.assertEqual(len(set(bodies)), 3)
+        self.assertEqual(self.site.renders, 2)
+        self.assertEqual(self.site.hits, 18)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import argparse
+import os
+import subprocess
+import sys
+import unittest
+from contextlib import redirect_stderr
+from io import StringIO
+
+from benchmark import generate_corpus, run_build
+from fixtures import temp_dir
+from main import parse_args
+from manifest import load_manifest
+from scan import DIRECTORY, FILE
+from shard import parse_shard, shard_of, shard_tree
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+
+def read_tree(root):
+    files = {}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, root)] = f.read()
+    return files
+
+
+class TestShard(unittest.TestCase):
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for text in ("0/4", "5/4", "1", "a/b"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_shard(text)
+
+    def test_watch_is_not_combined_with_shards(self):
+        for argv in (["--shard", "1/2"], ["--merge", "2"]):
+            with redirect_stderr(StringIO()), self.assertRaises(SystemExit):
+                parse_args(argv + ["--watch"])
+
+    def test_shard_of_is_stable_and_spread(self):
+        sources = [f"section-{i}/index.md" for i in range(200)]
+        shards = [shard_of(source, 4) for source in sources]
+        self.assertEqual(shards, [shard_of(source, 4) for source in sources])
+        self.assertEqual(set(shards), {1, 2, 3, 4})
+        self.assertEqual(shard_of("index.md", 4), 4)
+
+    def test_shard_tree_keeps_directories(self):
+        tree = {"blog": (None, None, DIRECTORY)}
+        tree.update({f"blog/{i}.md": (1, 1, FILE) for i in range(10)})
+        parts = [shard_tree(tree, index, 3) for index in (1, 2, 3)]
+        self.assertTrue(all("blog" in part for part in parts))
+        self.assertEqual(sum(len(part) - 1 for part in parts), 10)
+
+
+class TestShardedBuild(unittest.TestCase):
+    def setUp(self):
+        self.root = temp_dir(self)
+        generate_corpus(self.root, 30)
+
+    def build_shards(self, count):
+        processes = [subprocess.Popen(
+            [sys.executable, MAIN, "--shard", f"{index}/{count}"],
+            cwd=self.root, stdout=subprocess.DEVNULL)
+            for index in range(1, count + 1)]
+        self.assertEqual([process.wait() for process in processes],
+                         [0] * count)
+
+    def test_merged_shards_match_single_build(self):
+        run_build(self.root, [])
+        expected = read_tree(os.path.join(self.root, "docs"))
+        self.build_shards(3)
+        run_build(self.root, ["--merge", "3"])
+        self.assertEqual(read_tree(os.path.join(self.root, "docs")),
+                         expected)
+
+    def test_incremental_merge_records_and_prunes_pages(self):
+        self.build_shards(2)
+        run_build(self.root, ["--merge", "2", "--incremental"])
+        manifest = load_manifest(os.path.join(self.root,
+                                              ".build-manifest.json"))
+        page = os.path.join("section-1", "page-1", "index.md")
+        self.assertEqual(manifest["pages"][page]["output"],
+                         os.path.join("section-1", "page-1", "index.html"))
+        self.assertEqual(manifest["template"]["basepath"], "/")
+        self.assertIn(page, manifest["dependencies"])
+
+        os.remove(os.path.join(self.root, "content", page))
+        self.build_shards(2)
+        run_build(self.root, ["--merge", "2", "--incremental"])
+        manifest = load_manifest(os.path.join(self.root,
+                                              ".build-manifest.json"))
+        self.assertNotIn(page, manifest["pages"])
+        self.assertFalse(os.path.exists(os.path.join(
+            self.root, "docs", "section-1", "page-1")))
+
+        # An incremental build after the merge matches a full build.
+        run_build(self.root, ["--incremental"])
+        merged = read_tree(os.path.join(self.root, "docs"))
+        run_build(self.root, [])
+        self.assertEqual(merged, read_tree(os.path.join(self.root, "docs")))
+
+    def test_merge_rejects_missing_and_stale_pages(self):
+        self.build_shards(2)
+        page = os.path.join(self.root, "content", "section-1", "page-1",
+                            "index.md")
+        with open(page, "a") as f:
+            f.write("\nedited\n")
+        with self.assertRaises(Exception) as context:
+            run_build(self.root, ["--merge", "3"])
+        self.assertIn("missing from shard", str(context.exception))
+        with self.assertRaises(Exception) as context:
+            run_build(self.root, ["--merge", "2"])
+        self.assertIn("section-1/page-1/index.md is out of date",
+                      str(context.exception))
+
+    def test_merge_rejects_other_template_settings(self):
+        self.build_shards(2)
+        for argv in (["/site/"], ["--minify"]):
+            with self.assertRaises(Exception) as context:
+                run_build(self.root, argv + ["--merge", "2"])
+            self.assertIn("different template, basepath or --minify",
+                          str(context.exception))
+        with open(os.path.join(self.root, "template.html"), "a") as f:
+            f.write("<!-- edited -->\n")
+        with self.assertRaises(Exception) as context:
+            run_build(self.root, ["--merge", "2"])
+        self.assertIn("different template", str(context.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+
+from htmlnode import LeafNode, markdown_to_html_node, text_node_to_html_node
+from template import LinkRewriter, Template
+from textnode import TextNode, TextType
+
+
+class TestLinkRewriter(unittest.TestCase):
+    def test_rewrite_root_relative(self):
+        links = LinkRewriter("/site/")
+        self.assertEqual(links.rewrite("/images/a.png"), "/site/images/a.png")
+        self.assertEqual(links.rewrite("/"), "/site/")
+
+    def test_rewrite_leaves_other_urls(self):
+        links = LinkRewriter("/site/")
+        self.assertEqual(links.rewrite("https://example.com/"),
+                         "https://example.com/")
+        self.assertEqual(links.rewrite("images/a.png"), "images/a.png")
+
+    def test_rewrite_html(self):
+        links = LinkRewriter("/site/")
+        self.assertEqual(
+            links.rewrite_html('<link href="/index.css"><img src="/a.png">'),
+            '<link href="/site/index.css"><img src="/site/a.png">',
+        )
+
+    def test_rewrite_fingerprinted_assets(self):
+        links = LinkRewriter("/site/", {"/a.png": "/a.0123abcd.png"})
+        self.assertEqual(links.rewrite("/a.png"), "/site/a.0123abcd.png")
+        self.assertEqual(links.rewrite("/a.png?v=1#top"),
+                         "/site/a.0123abcd.png?v=1#top")
+        self.assertEqual(links.rewrite("/b.png"), "/site/b.png")
+        self.assertNotEqual(links.cache_key(),
+                            LinkRewriter("/site/").cache_key())
+
+    def test_fingerprinted_image_node(self):
+        links = LinkRewriter("/", {"/a.png": "/a.0123abcd.png"})
+        node = TextNode("alt", TextType.IMAGE, "/a.png")
+        self.assertEqual(text_node_to_html_node(node, links).to_html(),
+                         '<img src="/a.0123abcd.png" alt="alt"></img>')
+
+
+def render(template, title, html):
+    chunks = []
+    template.render_to(chunks.append, title, LeafNode(None, html))
+    return "".join(chunks)
+
+
+class TestTemplate(unittest.TestCase):
+    def test_render(self):
+        template = Template("<title>{{ Title }}</title>{{ Content }}</body>")
+        self.assertEqual(render(template, "Home", "<p>hi</p>"),
+                         "<title>Home</title><p>hi</p></body>")
+
+    def test_render_repeated_slot(self):
+        template = Template("{{ Title }}|{{ Title }}")
+        self.assertEqual(render(template, "a", ""), "a|a")
+
+    def test_render_to_streams_content_node(self):
+        template = Template("<title>{{ Title }}</title>{{ Content }}</body>")
+        chunks = []
+        node = markdown_to_html_node("**hi**")
+        template.render_to(chunks.append, "Home", node)
+        self.assertEqual("".join(chunks),
+                         "<title>Home</title><div><p><b>hi</b></p></div>"
+                         "</body>")
+
+    def test_basepath_applied_to_template_only(self):
+        template = Template('<a href="/">{{ Content }}</a>',
+                            LinkRewriter("/site/"))
+        self.assertEqual(
+            render(template, "", '<code>href="/x"</code>'),
+            '<a href="/site/"><code>href="/x"</code></a>',
+        )
+
+    def test_basepath_applied_to_nodes(self):
+        links = LinkRewriter("/site/")
+        node = markdown_to_html_node(
+            "[home](/) and ![cat](/cat.png) and [ext](https://a.b/)", links)
+        self.assertEqual(
+            node.to_html(),
+            '<div><p><a href="/site/">home</a> and '
+            '<img src="/site/cat.png" alt="cat"></img> and '
+            '<a href="https://a.b/">ext</a></p></div>',
+        )
+
+    def test_text_node_to_html_node_link(self):
+        node = TextNode("home", TextType.LINK, "/blog")
+        html_node = text_node_to_html_node(node, LinkRewriter("/site/"))
+        self.assertEqual(html_node.props, {"href": "/site/blog"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import os
+import time
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from fixtures import read_file, temp_dir, write_file
+from watch import (RESCAN, DevSite, InotifyWatcher, PollingWatcher,
+                   create_watcher)
+
+
+class TestDevSite(unittest.TestCase):
+    def setUp(self):
+        root = temp_dir(self)
+        self.content = os.path.join(root, "content")
+        self.static = os.path.join(root, "static")
+        self.dest = os.path.join(root, "docs")
+        self.template = os.path.join(root, "template.html")
+        write_file(self.template, "<main>{{ Content }}</main>")
+        self.page = os.path.join(self.content, "blog", "index.md")
+        write_file(self.page, "# Blog")
+        self.image = os.path.join(self.static, "images", "a.png")
+        write_file(self.image, "png")
+        self.site = DevSite(self.content, self.static, self.template,
+                            self.dest)
+        self.page_html = os.path.join(self.dest, "blog", "index.html")
+        self.image_copy = os.path.join(self.dest, "images", "a.png")
+
+    def handle(self, *paths):
+        with redirect_stdout(StringIO()):
+            self.site.handle_changes(set(paths))
+
+    def test_content_change_regenerates_page(self):
+        self.handle(self.page)
+        self.assertEqual(read_file(self.page_html),
+                         "<main><div><h1>Blog</h1></div></main>")
+
+    def test_content_delete_removes_page(self):
+        self.handle(self.page)
+        os.remove(self.page)
+        self.handle(self.page)
+        self.assertFalse(os.path.exists(self.page_html))
+
+    def test_template_change_rebuilds_from_memory(self):
+        write_file(self.template, "<p>{{ Content }}</p>")
+        self.handle(self.template)
+        self.assertEqual(read_file(self.page_html),
+                         "<p><div><h1>Blog</h1></div></p>")
+
+    def test_template_change_keeps_rest_of_batch(self):
+        self.handle(self.page)
+        os.remove(self.page)
+        write_file(self.template, "<p>{{ Content }}</p>")
+        write_file(self.image, "png 2")
+        self.handle(self.template, self.page, self.image)
+        self.assertFalse(os.path.exists(self.page_html))
+        self.assertEqual(read_file(self.image_copy), "png 2")
+
+    def test_rescan_removes_deleted_pages(self):
+        self.handle(self.page)
+        os.remove(self.page)
+        self.handle(RESCAN)
+        self.assertFalse(os.path.exists(self.page_html))
+
+    def test_static_change_and_delete(self):
+        self.handle(self.image)
+        self.assertEqual(read_file(self.image_copy), "png")
+        os.remove(self.image)
+        self.handle(self.image)
+        self.assertFalse(os.path.exists(self.image_copy))
+
+    def test_static_change_reruns_static_sync(self):
+        urls = {"/images/a.png": "/images/a.1.png"}
+        synced = []
+
+        def sync_static():
+            synced.append(True)
+            return urls, None
+
+        write_file(self.page, "# Blog\n\n![a](/images/a.png)")
+        self.site = DevSite(self.content, self.static, self.template,
+                            self.dest, sync_static=sync_static)
+        self.handle(self.image)
+        self.assertEqual(synced, [True])
+        self.assertFalse(os.path.exists(self.image_copy))
+        self.assertIn('src="/images/a.1.png"', read_file(self.page_html))
+
+        # Pages are only rebuilt when the synced URLs change.
+        os.remove(self.page_html)
+        self.handle(self.image)
+        self.assertFalse(os.path.exists(self.page_html))
+
+    def test_bad_page_does_not_stop_watching(self):
+        write_file(self.page, "no title")
+        self.handle(self.page)
+        self.assertFalse(os.path.exists(self.page_html))
+
+
+class TestWatchers(unittest.TestCase):
+    def setUp(self):
+        self.tmp = temp_dir(self)
+        self.root = os.path.join(self.tmp, "content")
+        self.file = os.path.join(self.root, "index.md")
+        write_file(self.file, "# One")
+
+    def check_detects_write(self, watcher):
+        try:
+            time.sleep(0.01)
+            write_file(self.file, "# Two")
+            new_file = os.path.join(self.root, "new", "index.md")
+            write_file(new_file, "# New")
+            changes = set()
+            deadline = time.monotonic() + 2
+            while time.monotonic() < deadline and not {
+                    self.file, new_file} <= changes:
+                changes |= watcher.poll(0.5)
+            self.assertIn(self.file, changes)
+            self.assertIn(new_file, changes)
+        finally:
+            watcher.close()
+
+    def test_polling_watcher(self):
+        self.check_detects_write(PollingWatcher([self.root], 0.01))
+
+    def test_inotify_watcher(self):
+        watcher = create_watcher([self.root])
+        if not isinstance(watcher, InotifyWatcher):
+            watcher.close()
+            self.skipTest("inotify is not available")
+        self.check_detects_write(watcher)
+
+
+if __name__ == "__main__":
+    unittest.main()
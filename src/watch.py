@@ -0,0 +1,363 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from shutil import copy2
+
+from generate_page import parse_page, write_page
+from htmlnode import INLINE_MEMO
+from inline_memo import DEFAULT_MAX_ENTRIES
+from output import remove_output
+from scan import scan_tree, tree_files
+from template import load_template
+
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE)
+EVENT_HEADER = struct.Struct("iIII")
+
+# Editors often save in several steps (write temp, rename, chmod), so a
+# burst of events is collected before rebuilding.
+DEBOUNCE_SECONDS = 0.02
+POLL_INTERVAL_SECONDS = 0.1
+
+# Returned in a change set when individual changes were lost and everything
+# has to be rescanned.
+RESCAN = None
+
+
+def scan_files(root):
+    return {os.path.join(root, relative): stat
+            for relative, stat in tree_files(scan_tree(root)).items()}
+
+
+class InotifyWatcher:
+    def __init__(self, paths):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.watches = {}
+        self.files = set()
+        for path in paths:
+            if os.path.isdir(path):
+                self._watch_tree(path)
+            else:
+                self.files.add(path)
+                self._watch_dir(os.path.dirname(path))
+        self.file_dirs = {os.path.dirname(path) for path in self.files}
+
+    def _watch_dir(self, path):
+        wd = self._add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"Cannot watch {path}")
+        self.watches[wd] = path
+
+    def _watch_tree(self, root):
+        self._watch_dir(root)
+        for dirpath, dirnames, _ in os.walk(root):
+            for dirname in dirnames:
+                self._watch_dir(os.path.join(dirpath, dirname))
+
+    def _read_events(self, changes):
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                changes.add(RESCAN)
+                continue
+            if wd not in self.watches:
+                continue
+
+            path = os.path.join(self.watches[wd], name)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                # Files may land in a new directory before it is watched.
+                self._watch_tree(path)
+                changes.update(scan_files(path))
+            elif self._is_watched(path):
+                changes.add(path)
+
+    def _is_watched(self, path):
+        # Single files are watched through their directory, so siblings
+        # of the template have to be filtered out.
+        return (path in self.files or
+                os.path.dirname(path) not in self.file_dirs)
+
+    def poll(self, timeout):
+        changes = set()
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return changes
+
+        deadline = time.monotonic() + DEBOUNCE_SECONDS
+        while True:
+            self._read_events(changes)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([self.fd], [], [],
+                                                   remaining)[0]:
+                return changes
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    def __init__(self, paths, interval=POLL_INTERVAL_SECONDS):
+        self.paths = paths
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        files = {}
+        for path in self.paths:
+            if os.path.isdir(path):
+                files.update(scan_files(path))
+            elif os.path.exists(path):
+                stat = os.stat(path)
+                files[path] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def poll(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            snapshot = self._scan()
+            changes = {path for path in snapshot.keys() | self.snapshot.keys()
+                       if snapshot.get(path) != self.snapshot.get(path)}
+            self.snapshot = snapshot
+            remaining = deadline - time.monotonic()
+            if changes or remaining <= 0:
+                return changes
+            time.sleep(min(self.interval, remaining))
+
+    def close(self):
+        pass
+
+
+def create_watcher(paths):
+    try:
+        return InotifyWatcher(paths)
+    except (OSError, AttributeError, TypeError):
+        return PollingWatcher(paths)
+
+
+class DevSite:
+    def __init__(self,
+                 dir_path_content,
+                 dir_path_static,
+                 template_path,
+                 dest_dir_path,
+                 basepath="/",
+                 assets=None,
+                 images=None,
+                 minify=False,
+                 sync_static=None):
+        self.content_dir = os.path.abspath(dir_path_content)
+        self.static_dir = os.path.abspath(dir_path_static)
+        self.template_path = os.path.abspath(template_path)
+        self.dest_dir = os.path.abspath(dest_dir_path)
+        self.basepath = basepath
+        self.assets = assets
+        self.images = images
+        self.minify = minify
+        # With fingerprinting, image variants or minification the build's
+        # own static sync is rerun instead of copying single files; it
+        # returns the new (assets, images).
+        self.sync_static = sync_static
+
+        self.load_template()
+        self.pages = set(scan_files(self.content_dir))
+        self.static_files = scan_files(self.static_dir)
+
+    def load_template(self):
+        self.template = load_template(self.template_path, self.basepath,
+                                      self.assets, self.images, self.minify)
+
+    def output_path(self, from_path):
+        relative = os.path.relpath(from_path, self.content_dir)
+        return os.path.join(self.dest_dir,
+                            os.path.splitext(relative)[0] + ".html")
+
+    def static_target(self, path):
+        return os.path.join(self.dest_dir,
+                            os.path.relpath(path, self.static_dir))
+
+    def generate(self, from_path):
+        with open(from_path, "r") as f:
+            markdown = f.read()
+        title, content_node = parse_page(markdown, self.template)
+        write_page(self.output_path(from_path), self.template, title,
+                   content_node)
+
+    def rebuild_all(self):
+        current = set(scan_files(self.content_dir))
+        for page in self.pages - current:
+            remove_output(self.output_path(page), self.dest_dir)
+        self.pages = current
+        for from_path in sorted(self.pages):
+            try:
+                self.generate(from_path)
+            except Exception as e:
+                print(f"Error: could not generate {from_path}: {e}")
+
+    def resync_static(self):
+        if self.sync_static:
+            self.sync_static_tree()
+            return
+        current = scan_files(self.static_dir)
+        for path in self.static_files.keys() - current.keys():
+            remove_output(self.static_target(path), self.dest_dir)
+        for path, stat in current.items():
+            if self.static_files.get(path) != stat:
+                self.copy_static(path)
+        self.static_files = current
+
+    def sync_static_tree(self):
+        # Pages embed fingerprinted names and image sizes, so they are
+        # rebuilt when those changed.
+        assets, images = self.sync_static()
+        self.static_files = scan_files(self.static_dir)
+        if (assets, images) != (self.assets, self.images):
+            self.assets = assets
+            self.images = images
+            self.load_template()
+            self.rebuild_all()
+
+    def copy_static(self, path):
+        target = self.static_target(path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        copy2(path, target)
+
+    def content_changed(self, path):
+        if os.path.isdir(path):
+            return
+        if os.path.isfile(path):
+            self.pages.add(path)
+            self.generate(path)
+            return
+
+        removed = {page for page in self.pages
+                   if page == path or page.startswith(path + os.sep)}
+        for page in removed:
+            remove_output(self.output_path(page), self.dest_dir)
+        self.pages -= removed
+
+    def static_changed(self, path):
+        if os.path.isdir(path):
+            return
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            self.static_files[path] = (stat.st_size, stat.st_mtime_ns)
+            self.copy_static(path)
+            return
+
+        removed = [file for file in self.static_files
+                   if file == path or file.startswith(path + os.sep)]
+        for file in removed:
+            remove_output(self.static_target(file), self.dest_dir)
+            del self.static_files[file]
+
+    def handle_changes(self, changes):
+        start = time.perf_counter()
+        rebuilt = RESCAN in changes or self.template_path in changes
+        if rebuilt:
+            self.load_template()
+            self.rebuild_all()
+            print(f"Rebuilt all pages in "
+                  f"{(time.perf_counter() - start) * 1000:.1f}ms")
+            if RESCAN in changes:
+                self.resync_static()
+                return
+
+        # After a full rebuild only the static files of the batch are
+        # left; rebuild_all has already handled added and removed pages.
+        static_changed = False
+        for path in sorted(changes - {self.template_path}):
+            try:
+                if path.startswith(self.content_dir + os.sep):
+                    if rebuilt:
+                        continue
+                    self.content_changed(path)
+                elif path.startswith(self.static_dir + os.sep):
+                    if self.sync_static:
+                        static_changed = True
+                        continue
+                    self.static_changed(path)
+                else:
+                    continue
+            except Exception as e:
+                print(f"Error: could not update {path}: {e}")
+                continue
+            print(f"Updated {path} in "
+                  f"{(time.perf_counter() - start) * 1000:.1f}ms")
+
+        if static_changed:
+            try:
+                self.sync_static_tree()
+            except Exception as e:
+                print(f"Error: could not sync {self.static_dir}: {e}")
+                return
+            print(f"Synced {self.static_dir} in "
+                  f"{(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+def start_server(directory, port):
+    handler = partial(SimpleHTTPRequestHandler, directory=directory)
+    server = ThreadingHTTPServer(("", port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def watch(dir_path_content,
+          dir_path_static,
+          template_path,
+          dest_dir_path,
+          basepath="/",
+          port=8888,
+          assets=None,
+          images=None,
+          minify=False,
+          sync_static=None,
+          memo_size=DEFAULT_MAX_ENTRIES):
+    INLINE_MEMO.resize(memo_size)
+    site = DevSite(dir_path_content, dir_path_static, template_path,
+                   dest_dir_path, basepath, assets, images, minify,
+                   sync_static)
+    watcher = create_watcher(
+        [site.content_dir, site.static_dir, site.template_path])
+    server = start_server(site.dest_dir, port)
+    print(f"Serving {site.dest_dir} at http://localhost:{port}/ "
+          f"(watching with {type(watcher).__name__})")
+
+    try:
+        while True:
+            changes = watcher.poll(1.0)
+            if changes:
+                site.handle_changes(changes)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        watcher.close()